@@ -0,0 +1,95 @@
+"""
+Latency of contact updates and deletes: the previous SELECT + ORM flush path against the
+single UPDATE/DELETE ... RETURNING statements in src/repository/contacts.py.
+
+Runs against the database from .env and cleans up after itself:
+
+    python -m benchmarks.contact_writes --rounds 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import date
+
+from sqlalchemy import and_, select
+
+from src.database.db import SessionLocal, database
+from src.database.instrumentation import QueryStats, query_stats
+from src.database.models import Contact, User
+from src.repository.contacts import update_contact, remove_contact
+from src.schemas.contact import ContactUpdateSchema
+
+BODY = ContactUpdateSchema(name="Taras", surname="Shevchenko", email="taras@example.com",
+                           phonenumber="+380441234567", birthday=date(1814, 3, 9), description="benchmark")
+
+
+async def update_contact_orm(contact_id, body, db, user):
+    contact = (await db.execute(select(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)))).scalar_one_or_none()
+    if contact:
+        for field, value in body.model_dump().items():
+            setattr(contact, field, value)
+        await db.commit()
+    return contact
+
+
+async def remove_contact_orm(contact_id, db, user):
+    contact = (await db.execute(select(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)))).scalar_one_or_none()
+    if contact:
+        await db.delete(contact)
+        await db.commit()
+    return contact
+
+
+async def measure(operation, contact_ids, user) -> tuple[float, float]:
+    latencies, stats = [], QueryStats()
+    token = query_stats.set(stats)
+    try:
+        for contact_id in contact_ids:
+            async with SessionLocal() as db:
+                started = time.perf_counter()
+                await operation(contact_id, db, user)
+                latencies.append(time.perf_counter() - started)
+    finally:
+        query_stats.reset(token)
+    return statistics.median(latencies) * 1000, stats.statements / len(contact_ids)
+
+
+async def create_contacts(user, count) -> list[int]:
+    async with SessionLocal() as db:
+        contacts = [Contact(user_id=user.id, **BODY.model_dump(exclude={"description"})) for _ in range(count)]
+        db.add_all(contacts)
+        await db.commit()
+        return [contact.id for contact in contacts]
+
+
+async def main(rounds: int):
+    database.open()
+    async with SessionLocal() as db:
+        user = User(username="benchmark", email=f"benchmark-{uuid.uuid4().hex}@example.com", password="-")
+        db.add(user)
+        await db.commit()
+    try:
+        ids = await create_contacts(user, rounds)
+        other = BODY.model_copy(update={"description": "benchmark, second round"})
+        results = {
+            "update, select + flush": await measure(lambda i, db, u: update_contact_orm(i, BODY, db, u), ids, user),
+            "update, RETURNING": await measure(lambda i, db, u: update_contact(i, other, db, u), ids, user),
+            "delete, select + flush": await measure(remove_contact_orm, ids[: rounds // 2], user),
+            "delete, RETURNING": await measure(remove_contact, ids[rounds // 2:], user),
+        }
+        print(f"{'operation':<24} {'median ms':>10} {'statements':>11}")
+        for name, (latency, statements) in results.items():
+            print(f"{name:<24} {latency:>10.3f} {statements:>11.1f}")
+    finally:
+        async with SessionLocal() as db:
+            await db.delete(await db.get(User, user.id))
+            await db.commit()
+        await database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=500)
+    asyncio.run(main(parser.parse_args().rounds))
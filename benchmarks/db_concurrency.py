@@ -0,0 +1,70 @@
+"""
+Load benchmark for the database layer: N concurrent "requests" per worker, each running one query,
+executed through the old blocking Session path and through the AsyncSession path.
+
+Run against the database from .env (Postgres recommended, pg_sleep emulates network latency):
+
+    python -m benchmarks.db_concurrency --requests 500 --concurrency 1 10 50 --query "SELECT pg_sleep(0.005)"
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.database.db import SQLALCHEMY_DATABASE_URL, SessionLocal, database
+
+
+async def run(handler, requests: int, concurrency: int) -> float:
+    """
+    The run function fires the given number of requests with a bounded concurrency and returns requests per second.
+
+    :param handler: Coroutine function that serves one request
+    :param requests: int: Total number of requests
+    :param concurrency: int: Number of requests in flight at the same time
+    :return: Requests per second
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def main(requests: int, levels: list[int], query: str):
+    database.open()
+    sync_engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_size=max(levels))
+    SyncSessionLocal = sessionmaker(bind=sync_engine)
+    stmt = text(query)
+
+    async def blocking_request():
+        # the pre-async code path: a sync Session called from an async handler
+        with SyncSessionLocal() as db:
+            db.execute(stmt)
+
+    async def async_request():
+        async with SessionLocal() as db:
+            await db.execute(stmt)
+
+    print(f"{'concurrency':>12} {'sync req/s':>12} {'async req/s':>12} {'speedup':>8}")
+    for concurrency in levels:
+        before = await run(blocking_request, requests, concurrency)
+        after = await run(async_request, requests, concurrency)
+        print(f"{concurrency:>12} {before:>12.1f} {after:>12.1f} {after / before:>7.2f}x")
+
+    sync_engine.dispose()
+    await database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--query", default="SELECT 1")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.query))
@@ -0,0 +1,61 @@
+"""
+Throughput of password hashing for a few bcrypt and argon2id cost settings, to pick
+BCRYPT_ROUNDS / ARGON2_* values that stay inside the login latency budget.
+
+Reports single-hash latency and hashes/second per core (one hashing thread per core):
+
+    python -m benchmarks.password_hashing --seconds 3
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.services.passwords import create_crypt_context
+
+CONFIGS = [
+    ("bcrypt rounds=10", dict(schemes=["bcrypt"], bcrypt_rounds=10)),
+    ("bcrypt rounds=12", dict(schemes=["bcrypt"], bcrypt_rounds=12)),
+    ("argon2id t=2 m=19MiB p=1", dict(schemes=["argon2"], argon2_time_cost=2, argon2_memory_cost=19456,
+                                      argon2_parallelism=1)),
+    ("argon2id t=3 m=64MiB p=4", dict(schemes=["argon2"], argon2_time_cost=3, argon2_memory_cost=65536,
+                                      argon2_parallelism=4)),
+]
+DEFAULTS = dict(bcrypt_rounds=12, argon2_time_cost=3, argon2_memory_cost=65536, argon2_parallelism=4)
+
+
+def measure(context, seconds: float, workers: int) -> tuple[float, float]:
+    started = time.perf_counter()
+    context.hash("benchmark")
+    latency = time.perf_counter() - started
+
+    deadline = time.perf_counter() + seconds
+
+    def loop():
+        count = 0
+        while time.perf_counter() < deadline:
+            context.hash("benchmark")
+            count += 1
+        return count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        total = sum(executor.map(lambda _: loop(), range(workers)))
+    return latency, total / (time.perf_counter() - started) / workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{'config':<28}{'latency ms':>12}{'hashes/s/core':>16}")
+    for name, options in CONFIGS:
+        context = create_crypt_context(**{**DEFAULTS, **options})
+        latency, per_core = measure(context, args.seconds, args.workers)
+        print(f"{name:<28}{latency * 1000:>12.1f}{per_core:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
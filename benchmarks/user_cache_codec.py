@@ -0,0 +1,42 @@
+"""
+Payload size and decode time of a cached user: the previous pickle of the ORM User
+against the msgpack UserEntry (a UserSnapshot with its early refresh fields) that
+src/services/cache.py stores. Needs no database or Redis:
+
+    python -m benchmarks.user_cache_codec --number 100000
+"""
+import argparse
+import pickle
+import time
+import timeit
+from datetime import datetime
+
+from src.database.models import User
+from src.services.cache import UserCache, UserEntry, UserSnapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+
+    user = User(id=42, username="deadpool", email="deadpool@example.com",
+                password="$2b$12$" + "x" * 53, refresh_token="x" * 200, confirmed=True,
+                avatar="https://res.cloudinary.com/name/image/upload/c_fill,h_250,w_250/v1/ContactsApp/deadpool",
+                created_at=datetime.now(), updated_at=datetime.now())
+    pickled = pickle.dumps(user)
+    entry = UserEntry(user=UserSnapshot.from_user(user), delta=0.004, expires=time.time() + 300)
+    packed = UserCache.encoder.encode(entry)
+
+    cases = [
+        ("pickle ORM User", pickled, lambda: pickle.loads(pickled)),
+        ("msgpack UserEntry", packed, lambda: UserCache.decoder.decode(packed)),
+    ]
+    print(f"{'codec':<24}{'bytes':>8}{'decode us':>12}")
+    for name, payload, decode in cases:
+        seconds = min(timeit.repeat(decode, number=args.number, repeat=3))
+        print(f"{name:<24}{len(payload):>8}{seconds / args.number * 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,80 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 from ipaddress import ip_address
 from typing import Callable
 from pathlib import Path
 
-import redis.asyncio as redis
 from fastapi import FastAPI, Request, status
 from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from src.routes import contacts, auth, users
+from src.routes import contacts, auth, users, internal, well_known
 from src.conf.config import settings
+from src.database.instrumentation import QueryStats, query_stats, report
+from src.database.db import SessionLocal, database
+from src.repository import users as repository_users
+from src.services.auth import auth_service
+from src.services.cache import redis_pool
+from src.services.known_emails import known_emails
+from src.services.warmup import warmup
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+
+async def maintain_known_emails(interval: float = 60):
+    """
+    The maintain_known_emails function keeps the Bloom filter of registered emails complete. Every interval
+    seconds it retries the additions that failed while Redis was unavailable, and fills the filter from the
+    users table when it is not ready: at start-up and after its ready flag expired or was dropped.
+    A worker skips the rebuild while another one is building the filter.
+
+    :param interval: float: Seconds between two passes
+    :return: None
+    :doc-author: Trelent
+    """
+    while True:
+        try:
+            await known_emails.sync()
+            async with SessionLocal() as db:
+                await known_emails.rebuild(repository_users.stream_emails(db))
+        except Exception:
+            logger.exception("maintaining the known emails filter failed")
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    The lifespan function creates the shared resources when the worker starts and closes them on shutdown:
+    the database engines, the Redis connection pool (used by the rate limiter, the user cache and the
+    import jobs) and the password hashing threads. It runs the listener that drops invalidated users
+    from the in-process user cache and maintains the Bloom filter of registered emails in the background.
+    With WARMUP enabled, connections are opened and the hot routes exercised before the worker
+    starts accepting requests.
+
+    :param app: FastAPI: The application
+    :return: An async context manager
+    :doc-author: Trelent
+    """
+    database.open()
+    r = redis_pool.open()
+    await FastAPILimiter.init(r)
+    tasks = [asyncio.create_task(auth_service.cache.listen()), asyncio.create_task(maintain_known_emails())]
+    if settings.warmup:
+        await warmup(app, settings.db_warmup_connections, settings.redis_warmup_connections)
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    auth_service.hasher.close()
+    await redis_pool.close()
+    await database.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 banned_ips = [
     # ip_address("192.168.1.1"),
@@ -26,6 +89,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # the next page cursor of GET /contacts/ is sent in a header
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -48,22 +113,34 @@ app.add_middleware(
 #     return response
 
 
-app.include_router(auth.router)
-app.include_router(users.router)
-app.include_router(contacts.router)
-
-
-@app.on_event("startup")
-async def startup():
+@app.middleware("http")
+async def sql_instrumentation(request: Request, call_next: Callable):
     """
-    The startup function is called when the application starts up.
-    It's a good place to initialize things that are needed by your app, like database connections or caches.
-    
-    :return: A future object, which is a coroutine
+    The sql_instrumentation function is a middleware function that counts the SQL statements a request
+    issues and the time they take. The totals are sent back in the Server-Timing header, and requests
+    that exceed the statement budget or repeat the same statement (suspected N+1) are logged.
+
+    :param request: Request: The incoming request
+    :param call_next: Callable: Call the next function in the pipeline
+    :return: A response object
     :doc-author: Trelent
     """
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, password=settings.redis_password)
-    await FastAPILimiter.init(r)
+    stats = QueryStats()
+    token = query_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        query_stats.reset(token)
+    response.headers.append("Server-Timing", stats.server_timing())
+    report(request.method, request.url.path, stats, settings.sql_statement_budget, settings.sql_n_plus_one_threshold)
+    return response
+
+
+app.include_router(auth.router)
+app.include_router(users.router)
+app.include_router(contacts.router)
+app.include_router(internal.router)
+app.include_router(well_known.router)
 
 
 @app.get("/")
@@ -0,0 +1,40 @@
+"""add contacts user indexes
+
+Revision ID: 9c2e4b7d1a36
+Revises: 3faf35e8f5d5
+Create Date: 2024-05-20 10:12:45.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '9c2e4b7d1a36'
+down_revision: Union[str, None] = '3faf35e8f5d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONTACT_COLUMNS = ['name', 'surname', 'email', 'phonenumber', 'birthday', 'description']
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_contacts_user_id_name', 'contacts', ['user_id', 'name'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_contacts_user_id_surname', 'contacts', ['user_id', 'surname'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_contacts_user_id_email', 'contacts', ['user_id', 'email'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'],
+                        postgresql_include=CONTACT_COLUMNS, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_contacts_user_id_id', table_name='contacts', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_contacts_user_id_email', table_name='contacts', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_contacts_user_id_surname', table_name='contacts', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_contacts_user_id_name', table_name='contacts', postgresql_concurrently=True, if_exists=True)
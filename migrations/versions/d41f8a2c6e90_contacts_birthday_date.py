@@ -0,0 +1,38 @@
+"""contacts birthday date
+
+Revision ID: d41f8a2c6e90
+Revises: 9c2e4b7d1a36
+Create Date: 2024-05-22 14:03:11.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd41f8a2c6e90'
+down_revision: Union[str, None] = '9c2e4b7d1a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('contacts', 'birthday', type_=sa.Date(), existing_type=sa.DateTime(),
+                    existing_nullable=False, postgresql_using='birthday::date')
+    op.add_column('contacts', sa.Column('birthday_md', sa.SmallInteger(), nullable=True))
+    op.execute("UPDATE contacts SET birthday_md = "
+               "EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday)")
+    op.alter_column('contacts', 'birthday_md', nullable=False, existing_type=sa.SmallInteger())
+    with op.get_context().autocommit_block():
+        op.create_index('ix_contacts_user_id_birthday_md', 'contacts', ['user_id', 'birthday_md'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_contacts_user_id_birthday_md', table_name='contacts',
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_column('contacts', 'birthday_md')
+    op.alter_column('contacts', 'birthday', type_=sa.DateTime(), existing_type=sa.Date(),
+                    existing_nullable=False)
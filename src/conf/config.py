@@ -4,8 +4,43 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     sqlalchemy_database_url: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800
+    db_pool_timeout: float = 30
+    warmup: bool = True
+    db_warmup_connections: int = 2
+    redis_warmup_connections: int = 2
+    sqlalchemy_replica_urls: list[str] = []
+    replica_retry_interval: float = 30
+    replica_read_your_writes_window: float = 5
+    sql_statement_budget: int = 10
+    sql_n_plus_one_threshold: int = 3
+    internal_allowed_networks: list[str] = []
+    internal_token: str | None = None
+    contacts_max_page_size: int = 100
+    contacts_bulk_max_items: int = 1000
+    import_batch_size: int = 1000
+    password_schemes: list[str] = ["bcrypt"]
+    bcrypt_rounds: int = 12
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536
+    argon2_parallelism: int = 4
+    password_hash_workers: int = 4
+    password_hash_queue_limit: int = 32
     secret_key: str
     algorithm: str
+    jwt_signing_key_file: str | None = None
+    jwt_verification_key_files: list[str] = []
+    jwks_max_age: int = 300
+    self_contained_access_tokens: bool = False
+    access_token_cache_size: int = 10000
+    login_window: float = 900
+    login_ip_max_failures: int = 50
+    login_account_max_failures: int = 5
+    login_backoff_base: float = 1
+    login_backoff_max: float = 900
     mail_username: EmailStr
     mail_password: str
     mail_from: EmailStr
@@ -14,6 +49,19 @@ class Settings(BaseSettings):
     redis_host: str = 'localhost'
     redis_port: int = 6379
     redis_password: str | None = None
+    redis_max_connections: int = 50
+    redis_socket_timeout: float = 0.5
+    redis_connect_timeout: float = 0.5
+    user_cache_ttl: int = 300
+    user_cache_local_size: int = 10000
+    user_cache_local_ttl: float = 30
+    user_cache_early_refresh_beta: float = 1.0
+    user_cache_lock: bool = False
+    user_cache_lock_timeout: float = 2.0
+    user_negative_cache_ttl: int = 60
+    user_bloom_capacity: int = 1000000
+    user_bloom_error_rate: float = 0.01
+    user_bloom_rebuild_interval: int = 86400
     cloudinary_name: str = 'name'
     cloudinary_api_key: str = 1234567894
     cloudinary_api_secret:str = 'secret'
@@ -1,17 +1,153 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import Request
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
 from src.conf.config import settings
+from src.database.pool import InstrumentedQueuePool
+from src.database.replicas import ReplicaSet, RecentWriters
 
+# Sync URL is kept as-is for Alembic (migrations/env.py)
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    """
+    The get_async_database_url function converts a sync SQLAlchemy URL into the URL of its async driver.
+    URLs that already use an async driver are returned unchanged.
+
+    :param url: str: The sync database URL from the settings
+    :return: The database URL with an async driver
+    """
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def create_pooled_engine(url: str):
+    return create_async_engine(
+        get_async_database_url(url),
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle,
+        pool_timeout=settings.db_pool_timeout,
+    )
+
+
+class Database:
+    """
+    Holds the engines of the primary and of the read replicas. They are created and disposed in the
+    application lifespan (main.py); scripts call open() and close() themselves. SessionLocal is bound
+    to the primary on open().
+    """
+
+    def __init__(self):
+        self.engine: AsyncEngine | None = None
+        self.replicas = ReplicaSet([], retry_interval=settings.replica_retry_interval)
+
+    def open(self) -> AsyncEngine:
+        """
+        The open function creates the engines, unless the primary engine is already set, and binds SessionLocal.
+
+        :param self: Represent the instance of the class
+        :return: The engine of the primary
+        """
+        if self.engine is None:
+            self.engine = create_pooled_engine(SQLALCHEMY_DATABASE_URL)
+            self.replicas = ReplicaSet([create_pooled_engine(url) for url in settings.sqlalchemy_replica_urls],
+                                       retry_interval=settings.replica_retry_interval)
+        SessionLocal.configure(bind=self.engine)
+        return self.engine
+
+    async def warmup(self, connections: int):
+        """
+        The warmup function opens up to `connections` connections to the primary and to every replica
+        at once and returns them to their pools, so the first requests do not pay for connecting.
+
+        :param self: Represent the instance of the class
+        :param connections: int: Number of connections to open per engine
+        :return: None
+        """
+        async def ping(engine: AsyncEngine):
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+
+        for engine in [self.engine, *self.replicas.engines]:
+            await asyncio.gather(*(ping(engine) for _ in range(connections)))
+
+    async def close(self):
+        for engine in [self.engine, *self.replicas.engines]:
+            if engine is not None:
+                await engine.dispose()
+        self.engine = None
+        self.replicas = ReplicaSet([], retry_interval=settings.replica_retry_interval)
+
+
+database = Database()
+recent_writers = RecentWriters(window=settings.replica_read_your_writes_window)
+
+SessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
+
+@event.listens_for(Session, "after_commit")
+def mark_committed(session):
+    session.info["committed"] = True
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db(request: Request):
+    async with SessionLocal() as db:
+        yield db
+        if db.sync_session.info.get("committed") and database.replicas.engines:
+            await recent_writers.mark(RecentWriters.key(request.headers.get("Authorization")))
+
+
+@asynccontextmanager
+async def read_session(authorization: str | None = None):
+    """
+    The read_session function opens a session on one of the read replicas.
+    It falls back to the primary when no replica is configured or healthy, and when the client
+    wrote something within the last REPLICA_READ_YOUR_WRITES_WINDOW seconds, on any worker (the
+    marker is kept in Redis). A replica that failed is only used again once a SELECT 1 probe on it
+    succeeds.
+
+    :param authorization: str | None: Authorization header that identifies the client
+    :return: An AsyncSession bound to a replica or to the primary
+    :doc-author: Trelent
+    """
+    replica = None
+    if database.replicas.engines and not await recent_writers.wrote_recently(RecentWriters.key(authorization)):
+        replica = await database.replicas.pick()
+    if replica is None:
+        async with SessionLocal() as db:
+            yield db
+        return
+    async with SessionLocal(bind=replica) as db:
+        db.info["replica"] = True
+        try:
+            yield db
+        except (exc.OperationalError, exc.InterfaceError, OSError):
+            database.replicas.mark_down(replica)
+            raise
+        except exc.DBAPIError as e:
+            if e.connection_invalidated:
+                database.replicas.mark_down(replica)
+            raise
+
+
+# Dependency for read-only routes
+async def get_read_db(request: Request):
+    async with read_session(request.headers.get("Authorization")) as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,80 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    Statements executed and time spent in the database while serving one request.
+    """
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+        self.counts = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.statements += 1
+        self.duration += duration
+        self.counts[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """
+        The repeated function returns the statements executed at least threshold times,
+        which usually means a lazy load or a query inside a loop (N+1).
+
+        :param self: Represent the instance of the class
+        :param threshold: int: Minimum number of identical executions
+        :return: A list of (statement, count) pairs, most repeated first
+        """
+        return [(statement, count) for statement, count in self.counts.most_common() if count >= threshold]
+
+    def server_timing(self) -> str:
+        """
+        The server_timing function renders the stats as a Server-Timing header value.
+
+        :param self: Represent the instance of the class
+        :return: A string like 'db;dur=1.52;desc="3 statements"'
+        """
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.statements} statements"'
+
+
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if query_stats.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = query_stats.get()
+    if stats is not None and conn.info.get("query_started"):
+        stats.record(statement, time.perf_counter() - conn.info["query_started"].pop())
+
+
+def report(method: str, path: str, stats: QueryStats, budget: int, n_plus_one_threshold: int):
+    """
+    The report function logs a request that went over its statement budget and every statement
+    that was repeated often enough to be a suspected N+1.
+
+    :param method: str: HTTP method of the request
+    :param path: str: Path of the request
+    :param stats: QueryStats: Stats collected for the request
+    :param budget: int: Maximum number of statements a request should issue
+    :param n_plus_one_threshold: int: Identical statements per request that count as N+1
+    :return: None
+    """
+    if stats.statements > budget:
+        logger.warning("%s %s issued %d statements (budget %d) in %.2f ms",
+                       method, path, stats.statements, budget, stats.duration * 1000)
+    for statement, count in stats.repeated(n_plus_one_threshold):
+        logger.warning("Suspected N+1 in %s %s: statement executed %d times: %s", method, path, count, statement)
@@ -1,12 +1,24 @@
-from sqlalchemy import Boolean, Column, Integer, String, func
-from sqlalchemy.orm import relationship
+from datetime import date
+
+from sqlalchemy import Boolean, Column, Index, Integer, SmallInteger, String, func
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql.schema import ForeignKey
-from sqlalchemy.sql.sqltypes import DateTime
+from sqlalchemy.sql.sqltypes import Date, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
 
+def birthday_key(birthday: date) -> int:
+    """
+    The birthday_key function encodes the month and day of a date as one sortable number, MMDD.
+
+    :param birthday: date: The date of birth
+    :return: month * 100 + day, e.g. 1231 for December 31
+    """
+    return birthday.month * 100 + birthday.day
+
+
 class Contact(Base):
     __tablename__ = "contacts"
     id = Column(Integer, primary_key=True)
@@ -14,11 +26,29 @@ class Contact(Base):
     surname = Column(String(50), nullable=False)
     email = Column(String(100), nullable=False)
     phonenumber = Column(String(13), nullable=False)
-    birthday = Column(DateTime, nullable=False)
+    birthday = Column(Date, nullable=False)
+    # month * 100 + day of the birthday, kept in sync by birthday_key
+    birthday_md = Column(SmallInteger, nullable=False)
     description = Column(String(150), nullable=True)
     user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
     user = relationship('User', backref="contacts", lazy="joined")
 
+    @validates('birthday')
+    def validate_birthday(self, key, birthday):
+        self.birthday_md = birthday_key(birthday)
+        return birthday
+
+    __table_args__ = (
+        Index('ix_contacts_user_id_name', 'user_id', 'name'),
+        Index('ix_contacts_user_id_surname', 'user_id', 'surname'),
+        Index('ix_contacts_user_id_email', 'user_id', 'email'),
+        Index('ix_contacts_user_id_birthday_md', 'user_id', 'birthday_md'),
+        # covers the contacts list page, so it can be answered with an index-only scan
+        Index('ix_contacts_user_id_id', 'user_id', 'id',
+              postgresql_include=['name', 'surname', 'email', 'phonenumber', 'birthday', 'birthday_md',
+                                  'description']),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
@@ -0,0 +1,72 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.services.metrics import Histogram
+
+
+class PoolStats:
+
+    def __init__(self):
+        self.timeouts = 0
+        self.wait = Histogram()
+
+    @property
+    def checkouts(self) -> int:
+        return self.wait.count
+
+    def observe_wait(self, seconds: float):
+        """
+        The observe_wait function records how long one checkout waited for a connection.
+
+        :param self: Represent the instance of the class
+        :param seconds: float: Time spent in pool.connect()
+        :return: None
+        """
+        self.wait.observe(seconds)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that measures how long every checkout waits for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.observe_wait(time.perf_counter() - started)
+
+
+def pool_status(pool: InstrumentedQueuePool) -> dict:
+    """
+    The pool_status function returns live statistics of a connection pool.
+
+    :param pool: InstrumentedQueuePool: The pool of an engine (engine.pool)
+    :return: A dict with the pool sizing, current usage and checkout wait times
+    """
+    stats = pool.stats
+    wait = stats.wait.snapshot()
+    return {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": stats.checkouts,
+        "timeouts": stats.timeouts,
+        "wait_seconds": {
+            "sum": wait["sum"],
+            "max": wait["max"],
+            "histogram": wait["histogram"],
+        },
+    }
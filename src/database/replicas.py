@@ -0,0 +1,149 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+
+from jose import JWTError, jwt
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.services.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaSet:
+    """
+    Round robin over read replica engines. A replica that fails with a connection error is taken
+    out of rotation for retry_interval seconds. After that it is probed with SELECT 1 and only put
+    back into rotation when the probe succeeds; otherwise it stays out for another retry_interval.
+    """
+
+    def __init__(self, engines: list[AsyncEngine], retry_interval: float, probe_timeout: float = 2.0):
+        self.engines = engines
+        self.retry_interval = retry_interval
+        self.probe_timeout = probe_timeout
+        self._down_until = {id(engine): 0.0 for engine in engines}
+        self._probing: set[int] = set()
+        self._counter = itertools.count()
+
+    async def pick(self) -> AsyncEngine | None:
+        """
+        The pick function returns the next healthy replica engine, or None when there is no healthy replica
+        and the caller should fall back to the primary. A replica whose retry interval has passed is probed
+        first, by one caller at a time; the others skip it meanwhile.
+
+        :param self: Represent the instance of the class
+        :return: An AsyncEngine or None
+        """
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            engine = self.engines[next(self._counter) % len(self.engines)]
+            down_until = self._down_until[id(engine)]
+            if not down_until:
+                return engine
+            if down_until <= now and id(engine) not in self._probing and await self.probe(engine):
+                return engine
+        return None
+
+    async def probe(self, engine: AsyncEngine) -> bool:
+        """
+        The probe function runs SELECT 1 on a replica that is out of rotation and puts it back if it answers
+        within probe_timeout seconds.
+
+        :param self: Represent the instance of the class
+        :param engine: AsyncEngine: The replica to check
+        :return: True if the replica is back in rotation
+        """
+        self._probing.add(id(engine))
+        try:
+            async with asyncio.timeout(self.probe_timeout):
+                async with engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+        except Exception as e:
+            logger.warning("read replica is still down: %r", e)
+            self.mark_down(engine)
+            return False
+        finally:
+            self._probing.discard(id(engine))
+        self._down_until[id(engine)] = 0.0
+        return True
+
+    def mark_down(self, engine: AsyncEngine):
+        """
+        The mark_down function takes a replica out of rotation after a connection failure.
+
+        :param self: Represent the instance of the class
+        :param engine: AsyncEngine: The replica that failed
+        :return: None
+        """
+        self._down_until[id(engine)] = time.monotonic() + self.retry_interval
+
+    def is_healthy(self, engine: AsyncEngine) -> bool:
+        return not self._down_until[id(engine)]
+
+
+class RecentWriters:
+    """
+    Remembers clients that committed a write in the last `window` seconds, so their reads go to the
+    primary until the replicas have caught up (read-your-writes). The marker is a Redis key with a
+    `window` expiry, so every worker sees it, and clients are identified by the subject (sub) of their
+    bearer token, so a refreshed access token keeps the protection. The claims are not verified here:
+    a forged token can at most send its subject's reads to the primary. If Redis fails the client is
+    treated as a recent writer and reads from the primary.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+
+    @staticmethod
+    def key(authorization: str | None) -> str | None:
+        """
+        The key function returns the Redis key of the client that sent the given Authorization header.
+
+        :param authorization: str | None: Authorization header of the request
+        :return: The key, or None for anonymous clients and headers without a bearer JWT
+        """
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        try:
+            subject = jwt.get_unverified_claims(token).get("sub")
+        except JWTError:
+            return None
+        if not isinstance(subject, str):
+            return None
+        return f"rw:v1:{subject.lower()}"
+
+    async def mark(self, key: str | None):
+        """
+        The mark function records that the client with the given key has just written to the primary.
+
+        :param self: Represent the instance of the class
+        :param key: str | None: Key returned by RecentWriters.key
+        :return: None
+        """
+        if key is None or self.window <= 0:
+            return
+        try:
+            await get_redis().set(key, 1, px=math.ceil(self.window * 1000))
+        except RedisError as e:
+            logger.warning("read-your-writes marker not stored: %r", e)
+
+    async def wrote_recently(self, key: str | None) -> bool:
+        """
+        The wrote_recently function tells whether the client with the given key wrote within the window.
+
+        :param self: Represent the instance of the class
+        :param key: str | None: Key returned by RecentWriters.key
+        :return: True if its reads should go to the primary
+        """
+        if key is None or self.window <= 0:
+            return False
+        try:
+            return bool(await get_redis().exists(key))
+        except RedisError as e:
+            logger.warning("read-your-writes marker not read, using the primary: %r", e)
+            return True
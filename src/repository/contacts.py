@@ -1,150 +1,288 @@
-from datetime import datetime, timedelta
+import calendar
+from datetime import date, timedelta
 
-from typing import List
+from typing import AsyncIterator, List, Sequence, Tuple
 
-from sqlalchemy import or_, and_, extract
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_, case, delete, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload
 
-from src.database.models import Contact, User
-from src.schemas.contact import ContactModel, ContactUpdateSchema
+from src.database.models import Contact, User, birthday_key
+from src.schemas.contact import ContactModel, ContactUpdateSchema, ContactPatchSchema
 
 
-async def get_contacts_by_params(name: str, surname: str, email: str, skip: int, limit: int, db: Session, user: User) -> List[Contact]:
+SORT_COLUMNS = {
+    "id": Contact.id,
+    "name": Contact.name,
+    "surname": Contact.surname,
+    "email": Contact.email,
+}
+
+
+async def get_contacts_by_params(name: str, surname: str, email: str, skip: int, limit: int, db: AsyncSession, user: User,
+                                 sort: str = "id", after: tuple | None = None) -> List[Contact]:
     """
     The get_contacts_by_params function returns a list of contacts that match the parameters passed in.
         If no parameters are passed, it will return all contacts for the user.
+        Contacts are ordered by the sort column and then by id, so pages are stable between calls.
+        When after is given, the page starts right after that (sort value, id) position (keyset pagination)
+        and skip is ignored.
     
     :param name: str: Filter the contacts by name
     :param surname: str: Filter the contacts by surname
     :param email: str: Filter the contacts by email
     :param skip: int: Skip the first n contacts in the database
     :param limit: int: Limit the number of results returned
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :param user: User: Get the user_id from the database
+    :param sort: str: Column to sort by, one of SORT_COLUMNS
+    :param after: tuple | None: (sort value, id) of the last contact of the previous page
     :return: A list of contacts that match the parameters
     :doc-author: Trelent
     """
+    column = SORT_COLUMNS[sort]
+    # the owner is already known; skip the joined load of Contact.user (and its password hash)
+    stmt = select(Contact).options(noload(Contact.user)).filter(Contact.user_id == user.id)
     if name or surname or email:
-        return db.query(Contact).filter(and_(or_(Contact.name == name, Contact.surname == surname, Contact.email == email), Contact.user_id == user.id)).offset(skip).limit(limit).all()
-    return db.query(Contact).filter(Contact.user_id == user.id).offset(skip).limit(limit).all()
+        stmt = stmt.filter(or_(Contact.name == name, Contact.surname == surname, Contact.email == email))
+    if sort == "id":
+        stmt = stmt.order_by(Contact.id)
+    else:
+        stmt = stmt.order_by(column, Contact.id)
+    if after is not None:
+        key, contact_id = after
+        if sort == "id":
+            stmt = stmt.filter(Contact.id > contact_id)
+        else:
+            stmt = stmt.filter(tuple_(column, Contact.id) > tuple_(key, contact_id))
+    else:
+        stmt = stmt.offset(skip)
+    contacts = await db.execute(stmt.limit(limit))
+    return contacts.scalars().all()
+
+
+async def stream_contacts(db: AsyncSession, user: User, batch_size: int = 1000) -> AsyncIterator[Sequence]:
+    """
+    The stream_contacts function reads all contacts of a user through a server-side cursor.
+        Plain rows are fetched instead of ORM objects, batch_size rows at a time, so memory use
+        does not depend on the size of the address book.
 
+    :param db: AsyncSession: Access the database
+    :param user: User: Get the user_id from the database
+    :param batch_size: int: Number of rows fetched per round trip
+    :return: An async iterator of row batches (id, name, surname, email, phonenumber, birthday, description)
+    :doc-author: Trelent
+    """
+    stmt = (
+        select(Contact.id, Contact.name, Contact.surname, Contact.email, Contact.phonenumber, Contact.birthday,
+               Contact.description)
+        .filter(Contact.user_id == user.id)
+        .order_by(Contact.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(stmt)
+    async for rows in result.partitions():
+        yield rows
 
-async def create_contact(body: ContactModel, db: Session, user: User) -> Contact:
+
+async def create_contact(body: ContactModel, db: AsyncSession, user: User) -> Contact:
     """
     The create_contact function creates a new contact in the database.
         
     
     :param body: ContactModel: Create a new contact
-    :param db: Session: Create a database session
+    :param db: AsyncSession: Create a database session
     :param user: User: Get the user id from the token and then use it to create a contact
     :return: The contact object
     :doc-author: Trelent
     """
     contact = Contact(name=body.name, surname=body.surname, email=body.email, 
-                   phonenumber=body.phonenumber, birthday=body.birthday, description=body.description, user=user)
+                   phonenumber=body.phonenumber, birthday=body.birthday, description=body.description, user_id=user.id)
     db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    await db.commit()
+    await db.refresh(contact)
     return contact
 
 
-async def update_contact(contact_id: int, body: ContactUpdateSchema, db: Session, user: User) -> Contact | None:
+async def create_contacts(bodies: List[ContactModel], db: AsyncSession, user: User) -> List[Contact]:
+    """
+    The create_contacts function creates many contacts in one transaction.
+        The rows are sent as a multi-row INSERT ... RETURNING, so the whole batch costs a single round trip
+        (or a few, for very large batches) instead of one insert and one refresh per contact.
+
+    :param bodies: List[ContactModel]: Validated contacts to create
+    :param db: AsyncSession: Create a database session
+    :param user: User: Get the user id from the token and then use it to create the contacts
+    :return: The created contacts, in the order of bodies
+    :doc-author: Trelent
+    """
+    if not bodies:
+        return []
+    rows = [{**body.model_dump(), "birthday_md": birthday_key(body.birthday), "user_id": user.id} for body in bodies]
+    contacts = await db.scalars(insert(Contact).returning(Contact, sort_by_parameter_order=True), rows)
+    contacts = contacts.all()
+    await db.commit()
+    return contacts
+
+
+async def update_contact(contact_id: int, body: ContactUpdateSchema, db: AsyncSession, user: User) -> Contact | None:
     """
     The update_contact function updates a contact in the database.
         Args:
             contact_id (int): The id of the contact to update.
             body (ContactUpdateSchema): A schema containing all fields that can be updated for a Contact object.
-            db (Session): An open connection to the database, provided by FastAPI's dependency injection system.
+            db (AsyncSession): An open connection to the database, provided by FastAPI's dependency injection system.
             user (User): The currently logged-in user, provided by FastAPI's dependency injection system via AuthMiddleware(). 
     
     :param contact_id: int: Get the contact from the database
     :param body: ContactUpdateSchema: Validate the data that is being passed in to the function
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :param user: User: Check if the user is authorized to update a contact
     :return: A contact object
     :doc-author: Trelent
     """
-    contact = db.query(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
-    if contact:
-        contact.name = body.name
-        contact.surname = body.surname
-        contact.email = body.email
-        contact.phonenumber = body.phonenumber
-        contact.birthday = body.birthday
-        contact.description = body.description
-        db.commit()
+    return await write_contact(contact_id, body.model_dump(), db, user)
+
+
+async def patch_contact(contact_id: int, body: ContactPatchSchema, db: AsyncSession, user: User) -> Contact | None:
+    """
+    The patch_contact function updates only the fields that were sent in the request.
+    
+    :param contact_id: int: Get the contact from the database
+    :param body: ContactPatchSchema: The fields to change
+    :param db: AsyncSession: Access the database
+    :param user: User: Check if the user is authorized to update a contact
+    :return: A contact object, or None if the user has no such contact
+    :doc-author: Trelent
+    """
+    values = body.model_dump(exclude_unset=True)
+    if not values:
+        return await get_contact(contact_id, db, user)
+    return await write_contact(contact_id, values, db, user)
+
+
+async def write_contact(contact_id: int, values: dict, db: AsyncSession, user: User) -> Contact | None:
+    """
+    The write_contact function writes the given columns of a contact with a single UPDATE ... RETURNING,
+    without loading the contact first.
+    
+    :param contact_id: int: Id of the contact
+    :param values: dict: Columns to write
+    :param db: AsyncSession: Access the database
+    :param user: User: Only contacts of this user are updated
+    :return: The updated contact, or None if the user has no such contact
+    :doc-author: Trelent
+    """
+    if "birthday" in values:
+        values["birthday_md"] = birthday_key(values["birthday"])
+    stmt = (
+        update(Contact)
+        .where(Contact.id == contact_id, Contact.user_id == user.id)
+        .values(**values)
+        .returning(Contact)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    contact = await db.scalars(stmt)
+    contact = contact.one_or_none()
+    await db.commit()
     return contact
 
 
-async def remove_contact(contact_id: int, db: Session, user: User) -> Contact | None:
+async def remove_contact(contact_id: int, db: AsyncSession, user: User) -> Contact | None:
     """
     The remove_contact function removes a contact from the database.
         Args:
             contact_id (int): The id of the contact to be removed.
-            db (Session): A connection to the database.
+            db (AsyncSession): A connection to the database.
             user (User): The user who is removing this contact from their list of contacts.
         Returns: 
             Contact | None: If successful, returns a Contact object representing the deleted record in JSON format; otherwise, returns None.
     
     :param contact_id: int: Identify which contact to delete
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :param user: User: Identify the user who is making the request
     :return: The contact object if it exists, otherwise it returns none
     :doc-author: Trelent
     """
-    contact = db.query(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
-    if contact:
-        db.delete(contact)
-        db.commit()
+    stmt = (
+        delete(Contact)
+        .where(Contact.id == contact_id, Contact.user_id == user.id)
+        .returning(Contact)
+        .execution_options(synchronize_session=False)
+    )
+    contact = await db.scalars(stmt)
+    contact = contact.one_or_none()
+    await db.commit()
     return contact
 
 
-async def get_contact(contact_id: int, db: Session, user: User) -> Contact:
+async def get_contact(contact_id: int, db: AsyncSession, user: User) -> Contact:
     """
     The get_contact function returns a contact from the database.
         Args:
             contact_id (int): The id of the contact to be retrieved.
-            db (Session): A connection to the database.
+            db (AsyncSession): A connection to the database.
             user (User): The user who is requesting this information.
         Returns: 
             Contact: A single Contact object that matches both the id and user_id provided.
     
     :param contact_id: int: Specify the contact id of the contact we want to get
-    :param db: Session: Pass in the database session
+    :param db: AsyncSession: Pass in the database session
     :param user: User: Check if the user is authorized to get this contact
     :return: The contact object with the specified id
     :doc-author: Trelent
     """
-    return db.query(Contact).filter(and_(Contact.id == contact_id, Contact.user_id == user.id)).first()
+    stmt = (
+        select(Contact).options(noload(Contact.user))
+        .filter(and_(Contact.id == contact_id, Contact.user_id == user.id))
+    )
+    contact = await db.execute(stmt)
+    return contact.scalar_one_or_none()
 
 
-async def get_birthdays_in_7_days(db: Session, user: User) -> List[Contact]:
+def birthday_ranges(start: date, days: int) -> List[Tuple[int, int]]:
     """
-    The get_birthdays_in_7_days function returns a list of contacts whose birthdays are within the next 7 days.
-    
-    
-    :param db: Session: Pass the database session to the function
+    The birthday_ranges function returns the inclusive ranges of Contact.birthday_md values
+    that fall between start and start + days.
+        A window that crosses New Year is split in two ranges. In a non-leap year, a window
+        ending on February 28 also includes February 29 birthdays, which are celebrated that day.
+
+    :param start: date: First day of the window
+    :param days: int: Length of the window in days, the last day is start + days
+    :return: A list of (first, last) birthday_md ranges
+    :doc-author: Trelent
+    """
+    if days >= 365:
+        return [(birthday_key(date(2000, 1, 1)), birthday_key(date(2000, 12, 31)))]
+    end = start + timedelta(days=days)
+    first, last = birthday_key(start), birthday_key(end)
+    if (end.month, end.day) == (2, 28) and not calendar.isleap(end.year):
+        last = birthday_key(date(2000, 2, 29))
+    if first <= last:
+        return [(first, last)]
+    return [(first, birthday_key(date(2000, 12, 31))), (birthday_key(date(2000, 1, 1)), last)]
+
+
+async def get_upcoming_birthdays(days: int, db: AsyncSession, user: User, today: date | None = None) -> List[Contact]:
+    """
+    The get_upcoming_birthdays function returns a list of contacts whose birthdays are within the next days days,
+    ordered by the upcoming birthday.
+        The filter is a range condition on the indexed birthday_md column, so the query only reads matching rows.
+
+    :param days: int: Length of the window in days
+    :param db: AsyncSession: Pass the database session to the function
     :param user: User: Get the user_id from the user model
-    :return: A list of contacts that have birthdays in the next 7 days
+    :param today: date | None: First day of the window, defaults to the current date
+    :return: A list of contacts that have birthdays in the next days days
     :doc-author: Trelent
     """
-    today = datetime.now().date()
-    end_date = today + timedelta(days=7)
-
-    contact = (db.query(Contact).filter(
-                and_(
-                    or_(
-                        and_(
-                            extract("month", Contact.birthday) == today.month,
-                            extract("day", Contact.birthday) >= today.day,
-                            extract("day", Contact.birthday) <= end_date.day,
-                        ),
-                        and_(
-                            extract("month", Contact.birthday) == end_date.month,
-                            extract("day", Contact.birthday) >= today.day,
-                            extract("day", Contact.birthday) <= end_date.day,
-                        ),
-                    ),
-                Contact.user_id == user.id)
-            ).all())
-    return contact
\ No newline at end of file
+    today = today or date.today()
+    ranges = birthday_ranges(today, days)
+    stmt = (
+        select(Contact).options(noload(Contact.user))
+        .filter(Contact.user_id == user.id)
+        .filter(or_(*(Contact.birthday_md.between(first, last) for first, last in ranges)))
+        .order_by(case((Contact.birthday_md >= birthday_key(today), 0), else_=1), Contact.birthday_md, Contact.id)
+    )
+    contacts = await db.execute(stmt)
+    return contacts.scalars().all()
@@ -1,34 +1,60 @@
-from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 from src.schemas.user import UserModel
+from src.services.known_emails import known_emails
 
 
-async def get_user_by_email(email: str, db: Session) -> User:
+async def get_user_by_email(email: str, db: AsyncSession) -> User:
     """
     The get_user_by_email function returns a user object from the database based on the email address provided.
         Args:
             email (str): The email address of the user to be retrieved.
-            db (Session): A connection to a database session.
+            db (AsyncSession): A connection to a database session.
+    
+    Emails known not to belong to any user are answered from Redis without a query. Only misses on the
+    primary are remembered: a replica may not have caught up with a new user yet.
     
     :param email: str: Pass in the email of the user we want to get from the database
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: The user with the given email address
     :doc-author: Trelent
     """
-    return db.query(User).filter(User.email == email).first()
+    if not await known_emails.might_exist(email):
+        return None
+    user = await db.execute(select(User).filter(User.email == email))
+    user = user.scalar_one_or_none()
+    if user is None and not db.info.get("replica"):
+        await known_emails.remember_missing(email)
+    return user
+
+
+async def stream_emails(db: AsyncSession, batch_size: int = 10000):
+    """
+    The stream_emails function yields the emails of all users in batches, with a server-side cursor.
+    
+    :param db: AsyncSession: Pass the database session to the function
+    :param batch_size: int: Number of emails per batch
+    :return: An async iterator of lists of emails
+    :doc-author: Trelent
+    """
+    result = await db.stream_scalars(select(User.email).execution_options(yield_per=batch_size))
+    async for batch in result.partitions():
+        yield list(batch)
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: AsyncSession) -> User:
     """
     The create_user function creates a new user in the database.
     
     :param body: UserModel: Create a new user object
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: A user object
     :doc-author: Trelent
     """
+    from libgravatar import Gravatar
+
     avatar = None
     try:
         g = Gravatar(body.email)
@@ -37,55 +63,56 @@ async def create_user(body: UserModel, db: Session) -> User:
         print(e)
     new_user = User(**body.model_dump(), avatar=avatar)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    await known_emails.add(new_user.email)
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_password(user: User, password: str, db: AsyncSession) -> None:
     """
-    The update_token function updates the refresh token for a user.
+    The update_password function stores a new password hash for a user.
     
-    :param user: User: Identify the user who is requesting a new token
-    :param token: str | None: Set the refresh_token field in the user model
-    :param db: Session: Commit the changes to the database
+    :param user: User: The user whose password hash is replaced
+    :param password: str: The new password hash
+    :param db: AsyncSession: Commit the changes to the database
     :return: None
     :doc-author: Trelent
     """
-    user.refresh_token = token
-    db.commit()
+    user.password = password
+    await db.commit()
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     The confirmed_email function sets the confirmed field of a user to True.
     
     :param email: str: Get the email of the user who is trying to confirm their account
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :return: None
     :doc-author: Trelent
     """
     user = await get_user_by_email(email, db)
     user.confirmed = True
-    db.commit()
+    await db.commit()
 
 
-async def update_avatar(email: str, url: str, db: Session) -> User:
+async def update_avatar(email: str, url: str, db: AsyncSession) -> User:
     """
     The update_avatar function updates the avatar of a user.
         Args:
             email (str): The email of the user to update.
             url (str): The new URL for the avatar image.
-            db (Session, optional): SQLAlchemy Session instance. Defaults to None.
+            db (AsyncSession, optional): SQLAlchemy AsyncSession instance. Defaults to None.
     
     :param email: str: Get the user by email and update their avatar
     :param url: str: Pass the url of the avatar to be updated
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: The updated user
     :doc-author: Trelent
     """
     user = await get_user_by_email(email, db)
     user.avatar = url
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
\ No newline at end of file
@@ -1,14 +1,23 @@
-from typing import List
+import os
+import shutil
+import tempfile
+from typing import Any, List, Literal
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status, BackgroundTasks, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi_limiter.depends import RateLimiter
-from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.db import get_db
-from src.database.models import User
-from src.schemas.contact import ContactModel, ContactUpdateSchema, ContactResponse
+from src.conf.config import settings
+from src.database.db import get_db, get_read_db, read_session
+from src.schemas.contact import ContactModel, ContactUpdateSchema, ContactPatchSchema, ContactResponse, ContactBulkResponse, ImportJobResponse
 from src.repository import contacts as repository_contacts
-from src.services.auth import auth_service
+from src.services.auth import auth_service, Principal
+from src.services.cursor import encode_cursor, decode_cursor
+from src.services.export import export_rows, MEDIA_TYPES
+from src.services.imports import import_jobs, run_import, FORMATS
 
 
 router = APIRouter(prefix='/contacts', tags=["Contacts"])
@@ -16,52 +25,178 @@ router = APIRouter(prefix='/contacts', tags=["Contacts"])
 
 @router.get("/", response_model=List[ContactResponse], description='No more than 10 requests per minute',
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def read_contacts_by_params(name: str = None, surname: str = None, email: str = None, skip: int = 0, limit: int = 10, 
-                                  db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def read_contacts_by_params(response: Response, name: str = None, surname: str = None, email: str = None,
+                                  skip: int = Query(default=0, ge=0),
+                                  limit: int = Query(default=10, ge=1, le=settings.contacts_max_page_size),
+                                  sort: Literal["id", "name", "surname", "email"] = "id", cursor: str = None,
+                                  db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(auth_service.get_principal)):
     """
     The read_contacts_by_params function returns a list of contacts that match the parameters provided.
         If no parameters are provided, all contacts will be returned.
+        When the page is full, the X-Next-Cursor response header holds the cursor of the next page.
+        Pass it back as cursor to continue from there; skip is only kept for offset paging.
     
+    :param response: Response: Set the X-Next-Cursor header
     :param name: str: Search for contacts by name
     :param surname: str: Filter the contacts by surname
     :param email: str: Search for a contact by email
     :param skip: int: Skip the first n records
     :param limit: int: Limit the number of contacts returned
-    :param db: Session: Get the database session
-    :param current_user: User: Get the current user from the auth_service
+    :param sort: str: Sort the contacts by this field
+    :param cursor: str: Cursor from the X-Next-Cursor header of the previous page
+    :param db: AsyncSession: Get the database session
+    :param current_user: Principal: Get the current user from the auth_service
     :return: A list of contact objects
     :doc-author: Trelent
     """
-    contact = await repository_contacts.get_contacts_by_params(name, surname, email, skip, limit, db, current_user)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    contact = await repository_contacts.get_contacts_by_params(name, surname, email, skip, limit, db, current_user,
+                                                               sort=sort, after=after)
+    if len(contact) == limit:
+        last = contact[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(sort, None if sort == "id" else getattr(last, sort), last.id)
     return contact
 
 
+@router.get("/export", response_class=StreamingResponse, description='No more than 2 requests per minute',
+            dependencies=[Depends(RateLimiter(times=2, seconds=60))])
+async def export_contacts(request: Request, fmt: Literal["csv", "ndjson"] = Query(default="csv", alias="format"),
+                          gzip: bool = False, current_user: Principal = Depends(auth_service.get_principal)):
+    """
+    The export_contacts function streams all contacts of the current user as a CSV or NDJSON file.
+        Rows are read through a server-side cursor and written out batch by batch, optionally gzipped,
+        so the export runs in constant memory.
+        The session is opened inside the stream because dependencies are closed before the body is sent.
+    
+    :param request: Request: Get the Authorization header for replica routing
+    :param fmt: str: Output format, csv or ndjson
+    :param gzip: bool: Compress the file with gzip
+    :param current_user: Principal: Get the current user from the auth_service
+    :return: A streaming response with the file
+    :doc-author: Trelent
+    """
+    async def content():
+        async with read_session(request.headers.get("Authorization")) as db:
+            async for chunk in export_rows(repository_contacts.stream_contacts(db, current_user), fmt, gzip):
+                yield chunk
+
+    filename = f"contacts.{fmt}" + (".gz" if gzip else "")
+    return StreamingResponse(content(), media_type="application/gzip" if gzip else MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
 @router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED, description='No more than 10 requests per minute',
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def create_contact(body: ContactModel, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def create_contact(body: ContactModel, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(auth_service.get_principal)):
     """
     The create_contact function creates a new contact in the database.
         
     
     :param body: ContactModel: Pass the data from the request body to the function
-    :param db: Session: Pass the database session to the repository layer
-    :param current_user: User: Get the current user from the auth_service
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: Principal: Get the current user from the auth_service
     :return: A contactmodel object
     :doc-author: Trelent
     """
     return await repository_contacts.create_contact(body, db, current_user)
 
 
+@router.post("/bulk", response_model=ContactBulkResponse, status_code=status.HTTP_201_CREATED,
+             description='No more than 2 requests per minute', dependencies=[Depends(RateLimiter(times=2, seconds=60))])
+async def create_contacts(body: List[Any], db: AsyncSession = Depends(get_db),
+                          current_user: Principal = Depends(auth_service.get_principal)):
+    """
+    The create_contacts function creates a batch of contacts in one transaction.
+        Every item is validated as a ContactModel; invalid items, including items that are not JSON
+        objects, are reported with their index in the request body and the valid ones are still created.
+    
+    :param body: List[Any]: The contacts to create, at most CONTACTS_BULK_MAX_ITEMS
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: Principal: Get the current user from the auth_service
+    :return: The created contacts and the validation errors
+    :doc-author: Trelent
+    """
+    if len(body) > settings.contacts_bulk_max_items:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"No more than {settings.contacts_bulk_max_items} contacts per request")
+    contacts, errors = [], []
+    for index, item in enumerate(body):
+        try:
+            contacts.append(ContactModel.model_validate(item))
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.errors(include_url=False, include_context=False)})
+    created = await repository_contacts.create_contacts(contacts, db, current_user)
+    return {"created": created, "errors": errors}
+
+
+def save_upload(file) -> str:
+    with tempfile.NamedTemporaryFile(prefix="contacts-import-", delete=False) as tmp:
+        shutil.copyfileobj(file, tmp, 1024 * 1024)
+    return tmp.name
+
+
+@router.post("/import", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED,
+             description='No more than 2 requests per minute', dependencies=[Depends(RateLimiter(times=2, seconds=60))])
+async def import_contacts(background_tasks: BackgroundTasks, file: UploadFile = File(),
+                          fmt: Literal["csv", "ndjson", "vcard"] = Query(default=None, alias="format"),
+                          current_user: Principal = Depends(auth_service.get_principal)):
+    """
+    The import_contacts function starts an import of contacts from an uploaded CSV, NDJSON or vCard file.
+        The upload is saved to a temporary file and imported in the background in batches;
+        the progress is available at GET /contacts/import/{job_id}.
+    
+    :param background_tasks: BackgroundTasks: Run the import after the response is sent
+    :param file: UploadFile: The file to import
+    :param fmt: str: csv, ndjson or vcard; guessed from the file extension when omitted
+    :param current_user: Principal: Get the current user from the auth_service
+    :return: The created import job
+    :doc-author: Trelent
+    """
+    fmt = fmt or FORMATS.get(os.path.splitext(file.filename or "")[1].lower())
+    if fmt is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown file format")
+    path = await run_in_threadpool(save_upload, file.file)
+    try:
+        job_id = await import_jobs.create(current_user.id, fmt)
+    except Exception:
+        os.remove(path)
+        raise
+    background_tasks.add_task(run_import, job_id, path, fmt, current_user)
+    return await import_jobs.get(job_id)
+
+
+@router.get("/import/{job_id}", response_model=ImportJobResponse)
+async def read_import_job(job_id: str, current_user: Principal = Depends(auth_service.get_principal)):
+    """
+    The read_import_job function returns the progress of an import: status, processed, imported and failed rows,
+    and the first errors.
+    
+    :param job_id: str: Id returned by POST /contacts/import
+    :param current_user: Principal: Get the current user from the auth_service
+    :return: The import job
+    :doc-author: Trelent
+    """
+    job = await import_jobs.get(job_id)
+    if job is None or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return job
+
+
 @router.get("/{contact_id}", response_model=ContactResponse)
-async def read_contact(contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def read_contact(contact_id: int, db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(auth_service.get_principal)):
     """
     The read_contact function returns a contact by its id.
         If the contact does not exist, it raises an HTTP 404 error.
     
     
     :param contact_id: int: Specify the contact id to retrieve
-    :param db: Session: Pass the database session to the function
-    :param current_user: User: Get the current user
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: Principal: Get the current user
     :return: A contact object
     :doc-author: Trelent
     """
@@ -72,7 +207,7 @@ async def read_contact(contact_id: int, db: Session = Depends(get_db), current_u
 
 
 @router.put("/{contact_id}", response_model=ContactResponse)
-async def update_contact(body: ContactUpdateSchema, contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def update_contact(body: ContactUpdateSchema, contact_id: int, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(auth_service.get_principal)):
     """
     The update_contact function updates a contact in the database.
         The function takes an id, body and db as parameters.
@@ -80,8 +215,8 @@ async def update_contact(body: ContactUpdateSchema, contact_id: int, db: Session
     
     :param body: ContactUpdateSchema: Pass the request body to the function
     :param contact_id: int: Identify the contact to be updated
-    :param db: Session: Pass the database session to the repository layer
-    :param current_user: User: Get the user id of the logged in user
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: Principal: Get the user id of the logged in user
     :return: A contactupdateschema object
     :doc-author: Trelent
     """
@@ -91,18 +226,36 @@ async def update_contact(body: ContactUpdateSchema, contact_id: int, db: Session
     return contact
 
 
+@router.patch("/{contact_id}", response_model=ContactResponse)
+async def patch_contact(body: ContactPatchSchema, contact_id: int, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(auth_service.get_principal)):
+    """
+    The patch_contact function updates only the fields of a contact that are present in the request body.
+    
+    :param body: ContactPatchSchema: The fields to change
+    :param contact_id: int: Identify the contact to be updated
+    :param db: AsyncSession: Pass the database session to the repository layer
+    :param current_user: Principal: Get the user id of the logged in user
+    :return: The updated contact
+    :doc-author: Trelent
+    """
+    contact = await repository_contacts.patch_contact(contact_id, body, db, current_user)
+    if contact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    return contact
+
+
 @router.delete("/{contact_id}", response_model=ContactResponse)
-async def remove_contact(contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def remove_contact(contact_id: int, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(auth_service.get_principal)):
     """
     The remove_contact function removes a contact from the database.
         Args:
             contact_id (int): The id of the contact to be removed.
-            db (Session, optional): A database session object for interacting with the database. Defaults to Depends(get_db).
-            current_user (User, optional): The user currently logged in and making this request. Defaults to Depends(auth_service.get_current_user).
+            db (AsyncSession, optional): A database session object for interacting with the database. Defaults to Depends(get_db).
+            current_user (Principal, optional): The user currently logged in and making this request. Defaults to Depends(auth_service.get_principal).
     
     :param contact_id: int: Specify the id of the contact to be deleted
-    :param db: Session: Pass the database session to the repository
-    :param current_user: User: Get the current user from the database
+    :param db: AsyncSession: Pass the database session to the repository
+    :param current_user: Principal: Get the current user from the database
     :return: A contact object
     :doc-author: Trelent
     """
@@ -113,14 +266,17 @@ async def remove_contact(contact_id: int, db: Session = Depends(get_db), current
 
 
 @router.get("/birthdays/", response_model=List[ContactResponse])
-async def birthdays_in_7_days(db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def upcoming_birthdays(days: int = Query(default=7, ge=0, le=366), db: AsyncSession = Depends(get_read_db),
+                             current_user: Principal = Depends(auth_service.get_principal)):
     """
-    The birthdays_in_7_days function returns a list of contacts with birthdays in the next 7 days.
+    The upcoming_birthdays function returns a list of contacts with birthdays in the next days days (7 by default),
+    ordered by the upcoming birthday.
     
-    :param db: Session: Pass the database session to the function
-    :param current_user: User: Get the user id from the token
-    :return: A list of contacts, but i want to return a list of names
+    :param days: int: Length of the window in days
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: Principal: Get the user id from the token
+    :return: A list of contacts
     :doc-author: Trelent
     """
-    contact = await repository_contacts.get_birthdays_in_7_days(db, current_user)
-    return contact
\ No newline at end of file
+    contact = await repository_contacts.get_upcoming_birthdays(days, db, current_user)
+    return contact
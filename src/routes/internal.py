@@ -0,0 +1,88 @@
+import hmac
+from ipaddress import ip_address, ip_network
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from src.conf.config import settings
+from src.database.db import database
+from src.database.pool import pool_status
+from src.services.auth import auth_service
+from src.services.known_emails import known_emails
+from src.services.throttle import login_throttle
+
+router = APIRouter(prefix='/internal', tags=["Internal"], include_in_schema=False)
+
+
+async def internal_only(request: Request):
+    """
+    The internal_only function is a dependency that lets a request through only when it carries the
+    INTERNAL_TOKEN in the X-Internal-Token header, or comes straight from an address in
+    INTERNAL_ALLOWED_NETWORKS. With neither configured the operational endpoints are closed.
+    Behind a reverse proxy every request comes from the proxy's address, so do not list it; use the token.
+
+    :param request: Request: Get the client's ip address and the token header
+    :return: None
+    :doc-author: Trelent
+    """
+    token = request.headers.get("X-Internal-Token")
+    if settings.internal_token and token and hmac.compare_digest(token.encode(), settings.internal_token.encode()):
+        return
+    try:
+        ip = ip_address(request.client.host)
+    except (AttributeError, ValueError):
+        ip = None
+    if ip is None or not any(ip in ip_network(network) for network in settings.internal_allowed_networks):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Internal endpoint")
+
+
+@router.get("/pool", dependencies=[Depends(internal_only)])
+async def read_pool_stats():
+    """
+    The read_pool_stats function returns live statistics of the database connection pool of this worker:
+    pool size, checked out and overflow connections and a histogram of checkout wait times,
+    for the primary and for every read replica.
+
+    :return: A dictionary with the pool statistics
+    :doc-author: Trelent
+    """
+    replicas = database.replicas
+    return {
+        "primary": pool_status(database.engine.pool),
+        "replicas": [{"healthy": replicas.is_healthy(replica), **pool_status(replica.pool)} for replica in replicas.engines],
+    }
+
+
+@router.get("/hashing", dependencies=[Depends(internal_only)])
+async def read_hashing_stats():
+    """
+    The read_hashing_stats function returns the password hashing pool metrics of this worker:
+    operations in flight and queued, rejections and latency.
+
+    :return: A dictionary with the hashing metrics
+    :doc-author: Trelent
+    """
+    return auth_service.hasher.metrics()
+
+
+@router.get("/cache", dependencies=[Depends(internal_only)])
+async def read_cache_stats():
+    """
+    The read_cache_stats function returns the hit and miss counters of the user cache of this worker,
+    for the in-process tier and for Redis, and of the unknown email checks.
+
+    :return: A dictionary with the cache metrics
+    :doc-author: Trelent
+    """
+    return {**auth_service.cache.metrics(), "unknown_emails": known_emails.metrics()}
+
+
+@router.get("/login", dependencies=[Depends(internal_only)])
+async def read_login_stats():
+    """
+    The read_login_stats function returns the login throttle counters of this worker:
+    attempts checked, attempts rejected per IP and per account, failures and account lockouts.
+
+    :return: A dictionary with the throttle counters
+    :doc-author: Trelent
+    """
+    return login_throttle.metrics()
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Response
+
+from src.conf.config import settings
+from src.services.auth import auth_service
+
+router = APIRouter(prefix='/.well-known', tags=["Auth"])
+
+
+@router.get("/jwks.json")
+async def read_jwks(response: Response):
+    """
+    The read_jwks function publishes the public keys that verify our tokens as a JSON Web Key Set,
+    so other services can check access tokens locally by their kid. The set is empty when tokens
+    are signed with a shared HMAC secret. Clients may cache it for JWKS_MAX_AGE seconds.
+
+    :param response: Response: Set the Cache-Control header
+    :return: A dictionary with the list of keys
+    :doc-author: Trelent
+    """
+    response.headers["Cache-Control"] = f"public, max-age={settings.jwks_max_age}"
+    return auth_service.keys.jwks()
@@ -1,37 +1,72 @@
 from datetime import date
-from typing import Optional
+from typing import Any, List, Optional
 from pydantic import BaseModel, Field, EmailStr, validator
 
 import re
 
 
+def validate_phone(phone):
+    regex = r"^(\+)[1-9][0-9\-\(\)\.]{9,15}$"
+    if phone and not re.search(regex, phone, re.I):
+        raise ValueError("Phone Number Invalid.")
+    return phone
+
+
 class ContactModel(BaseModel):
+    # lengths match the columns of Contact, so a valid contact always fits in its row
     name: str = Field(min_length=1, max_length=50)
     surname: str = Field(min_length=1, max_length=50)
-    email: EmailStr
-    phonenumber: str
+    email: EmailStr = Field(max_length=100)
+    phonenumber: str = Field(max_length=13)
     birthday: date
     description: Optional[str] = Field(default=None, max_length=150)
 
     @validator("phonenumber")
     def phone_validation(cls, phone):
-        regex = r"^(\+)[1-9][0-9\-\(\)\.]{9,15}$"
-        if phone and not re.search(regex, phone, re.I):
-            raise ValueError("Phone Number Invalid.")
-        return phone
+        return validate_phone(phone)
 
 
 class ContactUpdateSchema(ContactModel):
-    name: str
-    surname: str
-    email: EmailStr
-    phonenumber: str
-    birthday: date
-    description: str
+    description: str = Field(max_length=150)
+
+
+class ContactPatchSchema(BaseModel):
+    # fields that are not sent are left unchanged; null is only accepted for description
+    name: str = Field(default=None, min_length=1, max_length=50)
+    surname: str = Field(default=None, min_length=1, max_length=50)
+    email: EmailStr = Field(default=None, max_length=100)
+    phonenumber: str = Field(default=None, max_length=13)
+    birthday: date = None
+    description: Optional[str] = Field(default=None, max_length=150)
+
+    @validator("phonenumber")
+    def phone_validation(cls, phone):
+        return validate_phone(phone)
 
 
 class ContactResponse(ContactModel):
     id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class ContactBulkError(BaseModel):
+    index: int
+    errors: List[Any]
+
+
+class ContactBulkResponse(BaseModel):
+    created: List[ContactResponse]
+    errors: List[ContactBulkError]
+
+
+
+class ImportJobResponse(BaseModel):
+    id: str
+    format: str
+    status: str
+    processed: int
+    imported: int
+    failed: int
+    errors: List[str]
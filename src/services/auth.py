@@ -1,37 +1,52 @@
-import redis
-
+import hashlib
+import time
+import uuid
+from functools import partial
 from typing import Optional
 
-import pickle
-from jose import JWTError, jwt
+import msgspec
+from jose import JWTError
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
 
 from src.conf.config import settings
-from src.database.db import get_db
+from src.database.db import read_session
 from src.repository import users as repository_users
+from src.services.cache import LocalCache, UserCache, UserSnapshot
+from src.services.keys import KeyRing
+from src.services.refresh_tokens import RefreshTokenStore
+from src.services.passwords import PasswordHasher, create_crypt_context
+
+
+class Principal(msgspec.Struct, frozen=True):
+    """
+    The caller as described by a self-contained access token.
+    """
+    id: int
+    email: str
+    confirmed: bool
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    SECRET_KEY = settings.secret_key
-    ALGORITHM = settings.algorithm
+    hasher = PasswordHasher(partial(create_crypt_context, settings.password_schemes, settings.bcrypt_rounds,
+                                    settings.argon2_time_cost, settings.argon2_memory_cost,
+                                    settings.argon2_parallelism),
+                            workers=settings.password_hash_workers, queue_limit=settings.password_hash_queue_limit)
+    keys = KeyRing.from_settings(settings)
+    decoded_tokens = LocalCache(settings.access_token_cache_size, ttl=0)
+    refresh_tokens = RefreshTokenStore(ttl=7 * 24 * 60 * 60)
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-    cache = redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        db=0,
-        password=settings.redis_password,
-    )
+    cache = UserCache(ttl=settings.user_cache_ttl, local_size=settings.user_cache_local_size,
+                      local_ttl=settings.user_cache_local_ttl, early_refresh_beta=settings.user_cache_early_refresh_beta,
+                      lock=settings.user_cache_lock, lock_timeout=settings.user_cache_lock_timeout)
 
-    def verify_password(self, plain_password, hashed_password):
+    async def verify_password(self, plain_password, hashed_password):
         """
         The verify_password function takes a plain-text password and the hashed version of that password,
             and returns True if they match, False otherwise. This is used to verify that the user's login
             credentials are correct.
+            The check runs in the password hashing thread pool, so it does not block the event loop.
         
         :param self: Represent the instance of the class
         :param plain_password: Pass the password that is being checked
@@ -39,19 +54,33 @@ class Auth:
         :return: True or false depending on whether the password is correct
         :doc-author: Trelent
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return await self.hasher.verify(plain_password, hashed_password)
+
+    async def verify_and_update_password(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        The verify_and_update_password function checks a password like verify_password and, when the stored hash
+            uses a deprecated scheme or a lower cost than configured, also returns a new hash of the password.
+        
+        :param self: Represent the instance of the class
+        :param plain_password: Pass the password that is being checked
+        :param hashed_password: The stored hash
+        :return: A (verified, new hash or None) tuple
+        :doc-author: Trelent
+        """
+        return await self.hasher.verify_and_update(plain_password, hashed_password)
 
-    def get_password_hash(self, password: str):
+    async def get_password_hash(self, password: str):
         """
         The get_password_hash function takes a password as input and returns the hash of that password.
-            The function uses the pwd_context object to generate a hash from the given password.
+            The function uses the hasher's passlib context to generate a hash from the given password,
+            in the password hashing thread pool.
         
         :param self: Represent the instance of the class
         :param password: str: Pass the password into the function
         :return: A hash of the password
         :doc-author: Trelent
         """
-        return self.pwd_context.hash(password)
+        return await self.hasher.hash(password)
 
     # define a function to generate a new access token
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
@@ -71,7 +100,7 @@ class Auth:
         else:
             expire = datetime.now() + timedelta(minutes=15)
         to_encode.update({"iat": datetime.now(), "exp": expire, "scope": "access_token"})
-        encoded_access_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        encoded_access_token = self.keys.encode(to_encode)
         return encoded_access_token
 
     # define a function to generate a new refresh token
@@ -94,78 +123,178 @@ class Auth:
         else:
             expire = datetime.now() + timedelta(days=7)
         to_encode.update({"iat": datetime.now(), "exp": expire, "scope": "refresh_token"})
-        encoded_refresh_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        encoded_refresh_token = self.keys.encode(to_encode)
         return encoded_refresh_token
 
     async def decode_refresh_token(self, refresh_token: str):
         """
         The decode_refresh_token function takes a refresh token and decodes it.
-            If the scope is 'refresh_token', then we return the email address of the user.
+            If the scope is 'refresh_token', then we return its claims.
             Otherwise, we raise an HTTPException with status code 401 (UNAUTHORIZED) and detail message 'Invalid scope for token'.
         
         
         :param self: Represent the instance of the class
         :param refresh_token: str: Pass the refresh token to the function
-        :return: The email of the user who is trying to refresh their token
+        :return: The claims of the token: the email of the user (sub), its token family (fam) and id (jti)
         :doc-author: Trelent
         """
         try:
-            payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.keys.decode(refresh_token)
             if payload['scope'] == 'refresh_token':
-                email = payload['sub']
-                return email
+                return payload
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid scope for token')
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def start_session(self, email: str) -> str:
         """
-        The get_current_user function is a dependency that will be used in the UserController class.
-        It takes an access token as input and returns the user object associated with it.
-        If no user is found, then an HTTPException is raised.
+        The start_session function opens a new session (token family) for a user that just logged in,
+            so every device the user logs in from gets its own refresh token chain.
         
         :param self: Represent the instance of the class
-        :param token: str: Pass in the jwt token that is sent to the server
-        :param db: Session: Get the database session
-        :return: A user object
+        :param email: str: The email of the user
+        :return: The first refresh token of the session
+        :doc-author: Trelent
+        """
+        family, jti = uuid.uuid4().hex, uuid.uuid4().hex
+        await self.refresh_tokens.create(email, family, jti)
+        return await self.create_refresh_token(data={"sub": email, "fam": family, "jti": jti},
+                                               expires_delta=self.refresh_tokens.ttl)
+
+    async def rotate_session(self, refresh_token: str) -> tuple[str, str]:
+        """
+        The rotate_session function exchanges a refresh token for the next one of its session.
+            Each refresh token can be used once: reusing an older one revokes the whole session.
+        
+        :param self: Represent the instance of the class
+        :param refresh_token: str: The refresh token presented by the client
+        :return: The email of the user and the new refresh token
+        :doc-author: Trelent
+        """
+        payload = await self.decode_refresh_token(refresh_token)
+        invalid = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        if "fam" not in payload or "jti" not in payload:
+            raise invalid
+        jti = uuid.uuid4().hex
+        if not await self.refresh_tokens.rotate(payload["sub"], payload["fam"], payload["jti"], jti):
+            raise invalid
+        new_refresh_token = await self.create_refresh_token(data={"sub": payload["sub"], "fam": payload["fam"], "jti": jti},
+                                                            expires_delta=self.refresh_tokens.ttl)
+        return payload["sub"], new_refresh_token
+
+    async def end_session(self, refresh_token: str):
+        """
+        The end_session function revokes the session a refresh token belongs to.
+        
+        :param self: Represent the instance of the class
+        :param refresh_token: str: A refresh token of the session
+        :return: None
         :doc-author: Trelent
         """
-        credentials_exception = HTTPException(
+        payload = await self.decode_refresh_token(refresh_token)
+        if "fam" in payload:
+            await self.refresh_tokens.revoke(payload["sub"], payload["fam"])
+
+    def access_token_claims(self, user) -> dict:
+        """
+        The access_token_claims function returns the claims to put in an access token for the user.
+            With SELF_CONTAINED_ACCESS_TOKENS enabled the token also carries the user id and confirmation
+            state, so get_principal can authorize requests without loading the user.
+        
+        :param self: Represent the instance of the class
+        :param user: The user the token is issued to
+        :return: A dict of claims for create_access_token
+        :doc-author: Trelent
+        """
+        claims = {"sub": user.email}
+        if settings.self_contained_access_tokens:
+            claims.update(uid=user.id, confirmed=bool(user.confirmed))
+        return claims
+
+    @staticmethod
+    def credentials_exception():
+        return HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    def decode_access_token(self, token: str) -> dict:
+        """
+        The decode_access_token function verifies an access token and returns its claims.
+            Tokens with a bad signature, expired tokens, tokens of another scope and tokens
+            without a subject are rejected with 401. Valid tokens are kept decoded, keyed by
+            their SHA-256 digest, until they expire, so a hot token is verified only once per worker.
+        
+        :param self: Represent the instance of the class
+        :param token: str: The encoded jwt
+        :return: The claims of the token
+        :doc-author: Trelent
+        """
+        digest = hashlib.sha256(token.encode()).digest()
+        payload = self.decoded_tokens.get(digest)
+        if payload is not None:
+            return payload
         try:
-            # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload['scope'] == 'access_token':
-                email = payload["sub"]
-                if email is None:
-                    raise credentials_exception
-            else:
-                raise credentials_exception
-        except JWTError as e:
-            raise credentials_exception
+            payload = self.keys.decode(token)
+        except JWTError:
+            raise self.credentials_exception()
+        if payload.get('scope') != 'access_token' or payload.get('sub') is None:
+            raise self.credentials_exception()
+        if "exp" in payload:
+            self.decoded_tokens.set(digest, payload, ttl=payload["exp"] - time.time())
+        return payload
 
-        user_hash = str(email)
+    async def get_current_user(self, token: str = Depends(oauth2_scheme)):
+        """
+        The get_current_user function is a dependency that will be used in the UserController class.
+        It takes an access token as input and returns a snapshot of the user associated with it,
+        from the cache when possible; concurrent misses for one user share a single database load.
+        The load opens its own read session: it outlives a cancelled request that started it, and the
+        request's session would be closed under it.
+        If no user is found, then an HTTPException is raised.
+        
+        :param self: Represent the instance of the class
+        :param token: str: Pass in the jwt token that is sent to the server
+        :return: A UserSnapshot (id, email, username, avatar, confirmed)
+        :doc-author: Trelent
+        """
+        email = self.decode_access_token(token)["sub"]
 
-        user = self.cache.get(user_hash)
+        async def load():
+            async with read_session(f"Bearer {token}") as db:
+                user = await repository_users.get_user_by_email(email, db)
+            return UserSnapshot.from_user(user) if user else None
 
+        user = await self.cache.get_or_load(email, load)
         if user is None:
-            user = await repository_users.get_user_by_email(email, db)
-            if user is None:
-                raise credentials_exception
-            self.cache.set(user_hash, pickle.dumps(user))
-            self.cache.expire(user_hash, 300)
-        else:
-            user = pickle.loads(user)
+            raise self.credentials_exception()
         return user
+
+    async def get_principal(self, token: str = Depends(oauth2_scheme)):
+        """
+        The get_principal function is a lighter dependency than get_current_user for routes that only need
+        to know who the caller is. For a self-contained access token it builds the principal from the
+        token claims, without touching the cache or the database; tokens that carry no user id (issued
+        before SELF_CONTAINED_ACCESS_TOKENS was enabled) are resolved by get_current_user.
+        Because nothing is looked up, a deleted user keeps access until the token expires.
+        
+        :param self: Represent the instance of the class
+        :param token: str: Pass in the jwt token that is sent to the server
+        :return: A Principal, or a UserSnapshot for tokens without a user id
+        :doc-author: Trelent
+        """
+        payload = self.decode_access_token(token)
+        if "uid" not in payload:
+            return await self.get_current_user(token)
+        if not payload.get("confirmed"):
+            raise self.credentials_exception()
+        return Principal(id=payload["uid"], email=payload["sub"], confirmed=True)
     
     def create_email_token(self, data: dict):
         """
         The create_email_token function takes a dictionary of data and returns a JWT token.
-        The token is encoded with the SECRET_KEY and ALGORITHM defined in the class.
+        The token is signed with the key ring of the class.
         The iat (issued at) claim is set to datetime.now() and exp (expiration time) claim is set to 1 day from now.
         
         :param self: Represent the instance of the class
@@ -176,7 +305,7 @@ class Auth:
         to_encode = data.copy()
         expire = datetime.now() + timedelta(days=1)
         to_encode.update({"iat": datetime.now(), "exp": expire})
-        token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        token = self.keys.encode(to_encode)
         return token
     
     async def get_email_from_token(self, token: str):
@@ -191,7 +320,7 @@ class Auth:
         :doc-author: Trelent
         """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.keys.decode(token)
             email = payload["sub"]
             return email
         except JWTError as e:
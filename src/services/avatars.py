@@ -0,0 +1,42 @@
+from functools import cache
+
+from fastapi.concurrency import run_in_threadpool
+
+from src.conf.config import settings
+
+
+@cache
+def configure():
+    """
+    The configure function sets the Cloudinary credentials, once, on first use.
+    cloudinary is imported here, so workers that never upload avatars do not load it.
+
+    :return: None
+    """
+    import cloudinary
+
+    cloudinary.config(
+        cloud_name=settings.cloudinary_name,
+        api_key=settings.cloudinary_api_key,
+        api_secret=settings.cloudinary_api_secret,
+        secure=True
+    )
+
+
+async def upload_avatar(file, email: str) -> str:
+    """
+    The upload_avatar function uploads an image to Cloudinary as the avatar of a user,
+    in a worker thread since the Cloudinary client is blocking.
+
+    :param file: A file object with the image
+    :param email: str: The email of the user
+    :return: The URL of the avatar, cropped to 250x250
+    """
+    import cloudinary
+    import cloudinary.uploader
+
+    configure()
+    public_id = f"ContactsApp/{email}"
+    r = await run_in_threadpool(cloudinary.uploader.upload, file, public_id=public_id, overwrite=True)
+    return cloudinary.CloudinaryImage(public_id)\
+        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
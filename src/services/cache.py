@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+import msgspec
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+
+logger = logging.getLogger(__name__)
+
+# KEYS: lock. ARGV: owner token. Deletes the lock only if this owner still holds it
+UNLOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisPool:
+    """
+    Holds the process-wide redis.asyncio client. The connection pool is opened and closed
+    in the application lifespan (main.py) and shared by the user cache, the rate limiter
+    and the import jobs.
+    """
+
+    def __init__(self):
+        self.client: redis.Redis | None = None
+
+    def open(self) -> redis.Redis:
+        """
+        The open function creates the connection pool and the client that uses it, unless a client is already set.
+        Socket timeouts make a slow Redis fail fast with a RedisError instead of stalling the worker.
+
+        :param self: Represent the instance of the class
+        :return: The redis.asyncio client
+        """
+        if self.client is not None:
+            return self.client
+        pool = redis.ConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=0,
+            password=settings.redis_password,
+            max_connections=settings.redis_max_connections,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_connect_timeout,
+            health_check_interval=30,
+        )
+        self.client = redis.Redis(connection_pool=pool)
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose(close_connection_pool=True)
+            self.client = None
+
+
+redis_pool = RedisPool()
+
+
+def get_redis() -> redis.Redis:
+    """
+    The get_redis function returns the shared Redis client.
+
+    :return: The redis.asyncio client opened in the application lifespan
+    """
+    if redis_pool.client is None:
+        raise RuntimeError("Redis pool is not open")
+    return redis_pool.client
+
+
+class LocalCache:
+    """
+    Per-worker LRU cache whose entries also expire after ttl seconds, or after their own ttl.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        self.entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def pop(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class UserSnapshot(msgspec.Struct, array_like=True, frozen=True):
+    """
+    The part of a user that requests need, cached instead of the ORM object.
+    Encoded as a msgpack array, so a change of fields needs a new UserCache.VERSION.
+    """
+    id: int
+    email: str
+    username: str | None
+    avatar: str | None
+    confirmed: bool
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(id=user.id, email=user.email, username=user.username, avatar=user.avatar,
+                   confirmed=bool(user.confirmed))
+
+
+class UserEntry(msgspec.Struct, array_like=True, frozen=True):
+    """
+    A cached user with what early refresh needs: how long loading it took (delta, seconds)
+    and when the entry expires (unix time).
+    """
+    user: UserSnapshot
+    delta: float
+    expires: float
+
+
+class UserCache:
+    """
+    Two-tier cache of authenticated users: a per-worker LocalCache in front of Redis, where users
+    are stored as msgpack-encoded UserEntry. invalidate() publishes the email on a pub/sub channel
+    and every worker running listen() drops its local copy; the local TTL bounds staleness if a
+    message is lost. Redis errors, timeouts and undecodable payloads are logged and treated as a
+    miss, so the caller falls back to the database.
+
+    get_or_load() keeps hot users from expiring all at once: a Redis hit is refreshed early with a
+    probability that grows as the entry nears its expiry (XFetch, scaled by early_refresh_beta), only
+    one load per email runs at a time in a worker, and with lock enabled a short Redis lock lets one
+    worker load while the others wait for its result.
+    """
+    VERSION = 2
+    CHANNEL = f"user:v{VERSION}:invalidate"
+    encoder = msgspec.msgpack.Encoder()
+    decoder = msgspec.msgpack.Decoder(UserEntry)
+
+    def __init__(self, ttl: int, local_size: int, local_ttl: float, early_refresh_beta: float = 1.0,
+                 lock: bool = False, lock_timeout: float = 2.0):
+        self.ttl = ttl
+        self.local = LocalCache(local_size, local_ttl)
+        self.early_refresh_beta = early_refresh_beta
+        self.lock = lock
+        self.lock_timeout = lock_timeout
+        self.loading: dict[str, asyncio.Task] = {}
+        self.unlock_script = None
+        self.hits = {"local": 0, "redis": 0}
+        self.misses = {"local": 0, "redis": 0}
+        self.counters = {"loads": 0, "coalesced": 0, "early_refreshes": 0, "lock_waits": 0}
+
+    @classmethod
+    def key(cls, email: str) -> str:
+        return f"user:v{cls.VERSION}:{email}"
+
+    async def get(self, email: str, early_refresh: bool = False) -> UserSnapshot | None:
+        """
+        The get function returns a cached user from the local tier or from Redis.
+
+        :param self: Represent the instance of the class
+        :param email: str: Email of the user
+        :param early_refresh: bool: Report a Redis hit as a miss when XFetch picks it for an early refresh
+        :return: The cached UserSnapshot or None
+        """
+        user = self.local.get(email)
+        if user is not None:
+            self.hits["local"] += 1
+            return user
+        self.misses["local"] += 1
+        entry = await self.get_remote(email)
+        if entry is None:
+            self.misses["redis"] += 1
+            return None
+        if early_refresh and self.refresh_early(entry):
+            self.counters["early_refreshes"] += 1
+            return None
+        self.hits["redis"] += 1
+        self.local.set(email, entry.user)
+        return entry.user
+
+    def refresh_early(self, entry: UserEntry) -> bool:
+        return time.time() - entry.delta * self.early_refresh_beta * math.log(1 - random.random()) >= entry.expires
+
+    async def get_remote(self, email: str) -> UserEntry | None:
+        try:
+            data = await get_redis().get(self.key(email))
+        except RedisError as e:
+            logger.warning("user cache get failed: %r", e)
+            return None
+        if data is None:
+            return None
+        try:
+            return self.decoder.decode(data)
+        except msgspec.DecodeError as e:
+            logger.warning("user cache entry for %s is invalid: %r", email, e)
+            return None
+
+    async def set(self, user: UserSnapshot, delta: float = 0.0):
+        self.local.set(user.email, user)
+        entry = UserEntry(user=user, delta=delta, expires=time.time() + self.ttl)
+        try:
+            await get_redis().set(self.key(user.email), self.encoder.encode(entry), ex=self.ttl)
+        except RedisError as e:
+            logger.warning("user cache set failed: %r", e)
+
+    async def get_or_load(self, email: str, load: Callable[[], Awaitable[UserSnapshot | None]]) -> UserSnapshot | None:
+        """
+        The get_or_load function returns the cached user, or loads it with load() and caches it.
+        Concurrent misses for the same email in this worker wait for a single load.
+
+        :param self: Represent the instance of the class
+        :param email: str: Email of the user
+        :param load: Callable[[], Awaitable[UserSnapshot | None]]: Loads the user from the database
+        :return: The UserSnapshot, or None if there is no such user
+        """
+        user = await self.get(email, early_refresh=True)
+        if user is not None:
+            return user
+        task = self.loading.get(email)
+        if task is None:
+            task = asyncio.ensure_future(self.load(email, load))
+            self.loading[email] = task
+            task.add_done_callback(lambda _: self.loading.pop(email, None))
+        else:
+            self.counters["coalesced"] += 1
+        # a cancelled request must not cancel the load the others wait for
+        return await asyncio.shield(task)
+
+    async def load(self, email: str, load: Callable[[], Awaitable[UserSnapshot | None]]) -> UserSnapshot | None:
+        lock_key = self.key(email) + ":lock"
+        owner = uuid.uuid4().hex
+        locked = False
+        if self.lock:
+            try:
+                locked = await get_redis().set(lock_key, owner, nx=True, px=math.ceil(self.lock_timeout * 1000))
+                if not locked:
+                    self.counters["lock_waits"] += 1
+                    entry = await self.wait_for_entry(email)
+                    if entry is not None:
+                        self.local.set(email, entry.user)
+                        return entry.user
+            except RedisError as e:
+                logger.warning("user cache lock failed: %r", e)
+        self.counters["loads"] += 1
+        started = time.perf_counter()
+        try:
+            user = await load()
+            if user is not None:
+                await self.set(user, delta=time.perf_counter() - started)
+            return user
+        finally:
+            if locked:
+                await self.unlock(lock_key, owner)
+
+    async def unlock(self, lock_key: str, owner: str):
+        # after lock_timeout the lock may belong to another worker, so only our own is deleted
+        redis = get_redis()
+        if self.unlock_script is None:
+            self.unlock_script = redis.register_script(UNLOCK)
+        try:
+            await self.unlock_script(keys=[lock_key], args=[owner], client=redis)
+        except RedisError as e:
+            logger.warning("user cache unlock failed: %r", e)
+
+    async def wait_for_entry(self, email: str) -> UserEntry | None:
+        """
+        The wait_for_entry function polls Redis until there is an entry for the user (the one the worker
+        holding the lock stored, or the old one it is refreshing early), the lock is released, or lock_timeout passes.
+
+        :param self: Represent the instance of the class
+        :param email: str: Email of the user
+        :return: The fresh UserEntry, or None if the caller should load the user itself
+        """
+        redis = get_redis()
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            data, locked = await redis.mget(self.key(email), self.key(email) + ":lock")
+            if data is not None:
+                try:
+                    return self.decoder.decode(data)
+                except msgspec.DecodeError:
+                    return None
+            if locked is None:
+                return None
+        return None
+
+    async def invalidate(self, email: str):
+        """
+        The invalidate function removes a user from both tiers and tells the other workers
+        to drop their local copy.
+
+        :param self: Represent the instance of the class
+        :param email: str: Email of the user that changed
+        :return: None
+        """
+        self.local.pop(email)
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.delete(self.key(email))
+                pipe.publish(self.CHANNEL, email)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("user cache invalidation failed: %r", e)
+
+    async def listen(self):
+        """
+        The listen function drops local entries named on the invalidation channel. It runs for the
+        lifetime of the application and resubscribes after Redis errors; the local tier is cleared
+        on every (re)subscription because messages may have been missed meanwhile.
+
+        :param self: Represent the instance of the class
+        :return: None
+        """
+        while True:
+            try:
+                async with get_redis().pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    self.local.clear()
+                    while True:
+                        message = await pubsub.get_message(timeout=1.0)
+                        if message is not None:
+                            self.local.pop(message["data"].decode())
+            except RedisError as e:
+                logger.warning("user cache invalidation listener failed: %r", e)
+                await asyncio.sleep(1)
+
+    def metrics(self) -> dict:
+        return {
+            "local": {"hits": self.hits["local"], "misses": self.misses["local"], "size": len(self.local)},
+            "redis": {"hits": self.hits["redis"], "misses": self.misses["redis"]},
+            **self.counters,
+        }
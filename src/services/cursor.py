@@ -0,0 +1,39 @@
+import base64
+import json
+
+
+def encode_cursor(sort: str, key, contact_id: int) -> str:
+    """
+    The encode_cursor function packs the position after the last row of a page into an opaque string.
+
+    :param sort: str: Column the page is sorted by
+    :param key: The value of the sort column in the last row
+    :param contact_id: int: The id of the last row, it breaks ties between equal sort values
+    :return: A url-safe cursor string
+    """
+    payload = json.dumps({"s": sort, "k": key, "i": contact_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """
+    The decode_cursor function unpacks a cursor made by encode_cursor.
+        A ValueError is raised when the cursor is malformed, was made for another sort order, or its key
+        is not a string for name/surname/email or not null for id.
+
+    :param cursor: str: The cursor from the request
+    :param sort: str: Column the requested page is sorted by
+    :return: A (key, contact_id) tuple
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        cursor_sort, key, contact_id = payload["s"], payload["k"], payload["i"]
+    except (KeyError, TypeError, UnicodeDecodeError, json.JSONDecodeError, base64.binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match the sort order")
+    # the key is compared with the sort column in SQL, so it must have that column's type
+    if not isinstance(contact_id, int) or isinstance(contact_id, bool) \
+            or not (key is None if sort == "id" else isinstance(key, str)):
+        raise ValueError("Invalid cursor")
+    return key, contact_id
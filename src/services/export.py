@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Sequence
+
+EXPORT_FIELDS = ["id", "name", "surname", "email", "phonenumber", "birthday", "description"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def encode_csv(rows: Sequence, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def encode_ndjson(rows: Sequence) -> bytes:
+    lines = (json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str, ensure_ascii=False) for row in rows)
+    return "".join(line + "\n" for line in lines).encode()
+
+
+async def export_rows(batches: AsyncIterator[Sequence], fmt: str, compress: bool = False) -> AsyncIterator[bytes]:
+    """
+    The export_rows function turns batches of contact rows into chunks of a CSV or NDJSON document.
+        Only one batch is held in memory at a time. With compress, the chunks form a gzip stream
+        that is compressed on the fly.
+
+    :param batches: AsyncIterator[Sequence]: Batches of rows with the EXPORT_FIELDS columns
+    :param fmt: str: "csv" or "ndjson"
+    :param compress: bool: Gzip the output
+    :return: An async iterator of byte chunks
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def output(chunk: bytes) -> bytes:
+        return compressor.compress(chunk) if compressor else chunk
+
+    if fmt == "csv":
+        yield output(encode_csv([], header=True))
+    async for rows in batches:
+        chunk = output(encode_csv(rows) if fmt == "csv" else encode_ndjson(rows))
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
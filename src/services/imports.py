@@ -0,0 +1,228 @@
+import csv
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from itertools import islice
+from typing import Iterator
+
+import redis.asyncio as redis
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import exc
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.repository import contacts as repository_contacts
+from src.schemas.contact import ContactModel
+from src.services.cache import get_redis
+
+IMPORT_FIELDS = ["name", "surname", "email", "phonenumber", "birthday", "description"]
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".vcf": "vcard", ".vcard": "vcard"}
+
+
+def parse_csv(path: str) -> Iterator[tuple[int, dict | Exception]]:
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        reader = csv.DictReader(file)
+        if reader.fieldnames:
+            reader.fieldnames = [field.strip().lower() for field in reader.fieldnames]
+        for row in reader:
+            yield reader.line_num, {key: value or None for key, value in row.items() if key in IMPORT_FIELDS}
+
+
+def parse_ndjson(path: str) -> Iterator[tuple[int, dict | Exception]]:
+    with open(path, encoding="utf-8-sig") as file:
+        for line_num, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_num, e
+                continue
+            yield line_num, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+
+
+def parse_vcard_date(value: str) -> str:
+    value = value.strip()
+    if re.fullmatch(r"\d{8}", value):
+        return datetime.strptime(value, "%Y%m%d").date().isoformat()
+    return value[:10]
+
+
+def parse_vcard(path: str) -> Iterator[tuple[int, dict | Exception]]:
+    """
+    The parse_vcard function reads vCard 3.0/4.0 cards one by one (N, FN, EMAIL, TEL, BDAY and NOTE).
+
+    :param path: str: Path of the uploaded file
+    :return: An iterator of (line number of BEGIN:VCARD, contact fields) pairs
+    """
+    card, start, last = None, 0, None
+    with open(path, encoding="utf-8-sig") as file:
+        for line_num, line in enumerate(file, start=1):
+            line = line.rstrip("\r\n")
+            if line[:1] in (" ", "\t") and card is not None and last:
+                card[last] += line[1:]
+                continue
+            name, _, value = line.partition(":")
+            name = name.split(";")[0].upper()
+            if name == "BEGIN":
+                card, start, last = {}, line_num, None
+            elif name == "END" and card is not None:
+                yield start, vcard_to_contact(card)
+                card = None
+            elif card is not None and name not in card:
+                card[name], last = value, name
+            else:
+                last = None
+
+
+def vcard_to_contact(card: dict) -> dict:
+    contact = {}
+    surname, _, given = card.get("N", "").partition(";")
+    given = given.split(";")[0]
+    if not given and card.get("FN"):
+        given, _, rest = card["FN"].partition(" ")
+        surname = surname or rest
+    contact["name"], contact["surname"] = given or None, surname or None
+    contact["email"] = card.get("EMAIL")
+    contact["phonenumber"] = card.get("TEL", "").replace(" ", "") or None
+    contact["birthday"] = parse_vcard_date(card["BDAY"]) if card.get("BDAY") else None
+    contact["description"] = card.get("NOTE") or None
+    return contact
+
+
+PARSERS = {"csv": parse_csv, "ndjson": parse_ndjson, "vcard": parse_vcard}
+
+
+class ImportJobs:
+    """
+    Progress of contact imports, kept in Redis so any worker can report it.
+    """
+    TTL = 24 * 60 * 60
+    MAX_ERRORS = 100
+
+    def __init__(self, client: redis.Redis | None = None):
+        self.client = client
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self.client or get_redis()
+
+    @staticmethod
+    def key(job_id: str) -> str:
+        return f"import:{job_id}"
+
+    async def create(self, user_id: int, fmt: str) -> str:
+        job_id = uuid.uuid4().hex
+        await self.redis.hset(self.key(job_id), mapping={
+            "user_id": user_id, "format": fmt, "status": "queued", "processed": 0, "imported": 0, "failed": 0,
+        })
+        await self.redis.expire(self.key(job_id), self.TTL)
+        return job_id
+
+    async def update(self, job_id: str, status: str | None = None, processed: int = 0, imported: int = 0,
+                     errors: list[str] = ()):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if status:
+                pipe.hset(self.key(job_id), "status", status)
+            pipe.hincrby(self.key(job_id), "processed", processed)
+            pipe.hincrby(self.key(job_id), "imported", imported)
+            pipe.hincrby(self.key(job_id), "failed", len(errors))
+            if errors:
+                pipe.rpush(self.key(job_id) + ":errors", *errors)
+                pipe.ltrim(self.key(job_id) + ":errors", 0, self.MAX_ERRORS - 1)
+                pipe.expire(self.key(job_id) + ":errors", self.TTL)
+            await pipe.execute()
+
+    async def get(self, job_id: str) -> dict | None:
+        job = await self.redis.hgetall(self.key(job_id))
+        if not job:
+            return None
+        job = {key.decode(): value.decode() for key, value in job.items()}
+        errors = await self.redis.lrange(self.key(job_id) + ":errors", 0, -1)
+        return {
+            "id": job_id, "user_id": int(job["user_id"]), "format": job["format"], "status": job["status"],
+            "processed": int(job["processed"]), "imported": int(job["imported"]), "failed": int(job["failed"]),
+            "errors": [error.decode() for error in errors],
+        }
+
+
+import_jobs = ImportJobs()
+
+
+def validate_rows(rows: list[tuple[int, dict | Exception]]) -> tuple[list[tuple[int, ContactModel]], list[str]]:
+    contacts, errors = [], []
+    for line_num, row in rows:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            contacts.append((line_num, ContactModel.model_validate(row)))
+        except ValidationError as e:
+            fields = ", ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            errors.append(f"line {line_num}: {fields}")
+        except ValueError as e:
+            errors.append(f"line {line_num}: {e}")
+    return contacts, errors
+
+
+async def insert_rows(contacts: list[tuple[int, ContactModel]], db, user) -> tuple[int, list[str]]:
+    """
+    The insert_rows function inserts a batch of validated contacts in one statement. If the database rejects
+    the batch (a value it does not accept, a constraint), the batch is rolled back and the contacts are
+    inserted one by one, so only the rows the database rejects are lost and reported.
+
+    :param contacts: list[tuple[int, ContactModel]]: Line numbers and validated contacts
+    :param db: AsyncSession: The import session
+    :param user: User: Owner of the imported contacts
+    :return: The number of imported contacts and the errors of the rejected ones
+    """
+    try:
+        await repository_contacts.create_contacts([contact for _, contact in contacts], db, user)
+        return len(contacts), []
+    except (exc.DataError, exc.IntegrityError):
+        await db.rollback()
+    imported, errors = 0, []
+    for line_num, contact in contacts:
+        try:
+            await repository_contacts.create_contacts([contact], db, user)
+            imported += 1
+        except (exc.DataError, exc.IntegrityError) as e:
+            await db.rollback()
+            errors.append(f"line {line_num}: {str(e.orig).splitlines()[0]}")
+    return imported, errors
+
+
+async def run_import(job_id: str, path: str, fmt: str, user):
+    """
+    The run_import function imports an uploaded file in the background.
+        The file is parsed incrementally in a thread, rows are validated and inserted
+        IMPORT_BATCH_SIZE at a time, and the job progress is updated after every batch.
+        Rows the database rejects are reported as errors like invalid ones; they do not stop the import.
+        The uploaded file is removed when the job ends.
+
+    :param job_id: str: Id of the job created by ImportJobs.create
+    :param path: str: Path of the uploaded file
+    :param fmt: str: csv, ndjson or vcard
+    :param user: User: Owner of the imported contacts
+    :return: None
+    """
+    rows = PARSERS[fmt](path)
+    try:
+        await import_jobs.update(job_id, status="running")
+        async with SessionLocal() as db:
+            while True:
+                batch = await run_in_threadpool(lambda: list(islice(rows, settings.import_batch_size)))
+                if not batch:
+                    break
+                contacts, errors = validate_rows(batch)
+                imported, rejected = await insert_rows(contacts, db, user)
+                await import_jobs.update(job_id, processed=len(batch), imported=imported, errors=errors + rejected)
+        await import_jobs.update(job_id, status="done")
+    except Exception as e:
+        await import_jobs.update(job_id, status="failed", errors=[f"import stopped: {e}"])
+        raise
+    finally:
+        rows.close()
+        os.remove(path)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+from pathlib import Path
+
+from jose import jwk, jwt, JWTError
+from jose.constants import ALGORITHMS
+from jose.utils import base64url_encode
+
+ASYMMETRIC_ALGORITHMS = ALGORITHMS.RSA | ALGORITHMS.EC
+THUMBPRINT_MEMBERS = {"RSA": ("e", "kty", "n"), "EC": ("crv", "kty", "x", "y")}
+
+
+def thumbprint(public_jwk: dict) -> str:
+    """
+    The thumbprint function computes the RFC 7638 JWK thumbprint of a public key, used as its kid.
+
+    :param public_jwk: dict: The public key as a JWK
+    :return: The base64url encoded SHA-256 thumbprint
+    """
+    members = {name: public_jwk[name] for name in THUMBPRINT_MEMBERS[public_jwk["kty"]]}
+    digest = hashlib.sha256(json.dumps(members, separators=(",", ":"), sort_keys=True).encode()).digest()
+    return base64url_encode(digest).decode()
+
+
+class KeyRing:
+    """
+    Keys that sign and verify our JWTs.
+
+    With an HMAC algorithm (HS256...) tokens are signed with the shared secret and there is nothing
+    to publish. With RS*/ES* tokens are signed with the private signing key and carry its kid; they
+    are verified with the public key named by their kid, taken from the signing key and from the
+    extra verification keys. Rotation: publish the next public key as a verification key, switch
+    the signing key once edge services have picked it up from the JWKS, and keep the previous
+    public key until the tokens it signed have expired.
+    """
+
+    def __init__(self, algorithm: str, secret: str | None = None, signing_key: str | None = None,
+                 verification_keys: list[str] = ()):
+        self.algorithm = algorithm
+        self.secret = secret
+        self.signing_key = None
+        self.signing_kid = None
+        self.public_keys = {}
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            return
+        if signing_key is None:
+            raise ValueError(f"{algorithm} needs a private signing key")
+        self.signing_key = jwk.construct(signing_key, algorithm)
+        for key in [self.signing_key, *(jwk.construct(pem, algorithm) for pem in verification_keys)]:
+            public_key = key.public_key()
+            self.public_keys[thumbprint(public_key.to_dict())] = public_key
+        self.signing_kid = thumbprint(self.signing_key.public_key().to_dict())
+
+    @classmethod
+    def from_settings(cls, settings) -> "KeyRing":
+        """
+        The from_settings function builds the key ring from the JWT_* settings, reading the PEM files.
+
+        :param settings: Settings: The application settings
+        :return: A KeyRing
+        """
+        read = lambda path: Path(path).read_text()
+        return cls(
+            settings.algorithm,
+            secret=settings.secret_key,
+            signing_key=read(settings.jwt_signing_key_file) if settings.jwt_signing_key_file else None,
+            verification_keys=[read(path) for path in settings.jwt_verification_key_files],
+        )
+
+    def encode(self, claims: dict) -> str:
+        if self.signing_key is None:
+            return jwt.encode(claims, self.secret, algorithm=self.algorithm)
+        return jwt.encode(claims, self.signing_key, algorithm=self.algorithm, headers={"kid": self.signing_kid})
+
+    def decode(self, token: str) -> dict:
+        """
+        The decode function verifies the signature and the expiry of a token and returns its claims.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded jwt
+        :return: The claims of the token
+        :raises JWTError: If the token is malformed, expired, signed by an unknown key or with another algorithm
+        """
+        if self.signing_key is None:
+            return jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        key = self.public_keys.get(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise JWTError("Unknown key id")
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    def jwks(self) -> dict:
+        """
+        The jwks function returns the public verification keys as a JSON Web Key Set.
+
+        :param self: Represent the instance of the class
+        :return: A dict with the "keys" list
+        """
+        return {"keys": [{**key.to_dict(), "kid": kid, "use": "sig", "alg": self.algorithm}
+                         for kid, key in self.public_keys.items()]}
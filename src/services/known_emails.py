@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import math
+from typing import AsyncIterator
+
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.services.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class KnownEmails:
+    """
+    Answers "is there a user with this email?" without the database when the answer is no.
+
+    A Bloom filter of registered emails lives in a Redis bitmap. It is filled from the users table by
+    rebuild() and kept current by add(), called when a user is created; it is only trusted once the
+    rebuild has finished and set the ready flag. Behind it, emails that the primary database did not
+    find are remembered for negative_ttl seconds. Both checks take one Redis round trip; Redis errors
+    count as "maybe", so the caller falls back to the database.
+
+    A user missing from the filter would be reported as unknown, so the filter must not lose one: an add()
+    that fails drops the ready flag if it can and is retried by sync(), and the ready flag expires after
+    rebuild_interval seconds, so users inserted outside create_user are picked up by the next rebuild.
+    """
+    VERSION = 1
+
+    def __init__(self, capacity: int, error_rate: float, negative_ttl: int, rebuild_interval: int = 86400):
+        self.size = max(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.negative_ttl = negative_ttl
+        self.rebuild_interval = rebuild_interval
+        # emails whose add() failed; this worker answers "maybe" for them until sync() has added them
+        self.unsynced: set[str] = set()
+        self.bloom_key = f"users:v{self.VERSION}:bloom:{self.size}:{self.hashes}"
+        self.ready_key = self.bloom_key + ":ready"
+        self.counters = {"lookups": 0, "bloom_rejects": 0, "negative_hits": 0, "misses": 0}
+
+    def negative_key(self, email: str) -> str:
+        return f"users:v{self.VERSION}:missing:{email}"
+
+    def bits(self, email: str) -> list[int]:
+        digest = hashlib.sha256(email.lower().encode()).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:16], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    async def might_exist(self, email: str) -> bool:
+        """
+        The might_exist function tells whether the database has to be asked about an email.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email to look up
+        :return: False if no user has this email for sure, True otherwise
+        """
+        self.counters["lookups"] += 1
+        if email in self.unsynced:
+            return True
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.exists(self.ready_key)
+                pipe.exists(self.negative_key(email))
+                for bit in self.bits(email):
+                    pipe.getbit(self.bloom_key, bit)
+                ready, missing, *bits = await pipe.execute()
+        except RedisError as e:
+            logger.warning("known emails check failed: %r", e)
+            return True
+        if ready and not all(bits):
+            self.counters["bloom_rejects"] += 1
+            return False
+        if missing:
+            self.counters["negative_hits"] += 1
+            return False
+        return True
+
+    async def remember_missing(self, email: str):
+        self.counters["misses"] += 1
+        try:
+            await get_redis().set(self.negative_key(email), 1, ex=self.negative_ttl)
+        except RedisError as e:
+            logger.warning("known emails update failed: %r", e)
+
+    async def add(self, email: str):
+        """
+        The add function registers the email of a new user: it sets its bits in the Bloom filter
+        and drops it from the negative cache. When Redis fails, the filter stops being trusted
+        (if the ready flag can still be deleted) and the email is kept for sync() to add later.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email of the new user
+        :return: None
+        """
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for bit in self.bits(email):
+                    pipe.setbit(self.bloom_key, bit, 1)
+                pipe.delete(self.negative_key(email))
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("known emails update failed: %r", e)
+            self.unsynced.add(email)
+            try:
+                await get_redis().delete(self.ready_key)
+            except RedisError:
+                pass
+
+    async def sync(self):
+        """
+        The sync function retries the additions that failed, so the other workers find these users again.
+
+        :param self: Represent the instance of the class
+        :return: None
+        """
+        for email in list(self.unsynced):
+            self.unsynced.discard(email)
+            await self.add(email)
+
+    async def rebuild(self, emails: AsyncIterator[list[str]]) -> bool:
+        """
+        The rebuild function fills the Bloom filter from batches of registered emails and marks it ready.
+        It does nothing when the filter is already ready or another worker is building it. Bits are only
+        ever added, so users created while it runs are not lost.
+
+        :param self: Represent the instance of the class
+        :param emails: AsyncIterator[list[str]]: Batches of all registered emails
+        :return: True if this call built the filter
+        """
+        redis = get_redis()
+        if await redis.exists(self.ready_key):
+            return False
+        if not await redis.set(self.bloom_key + ":building", 1, nx=True, ex=600):
+            return False
+        try:
+            count = 0
+            async for batch in emails:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for email in batch:
+                        for bit in self.bits(email):
+                            pipe.setbit(self.bloom_key, bit, 1)
+                    await pipe.execute()
+                count += len(batch)
+            await redis.set(self.ready_key, count, ex=self.rebuild_interval)
+        finally:
+            await redis.delete(self.bloom_key + ":building")
+        logger.info("known emails filter built from %d users", count)
+        return True
+
+    def metrics(self) -> dict:
+        rejected = self.counters["bloom_rejects"] + self.counters["negative_hits"]
+        return {**self.counters, "hit_rate": rejected / self.counters["lookups"] if self.counters["lookups"] else 0.0}
+
+
+known_emails = KnownEmails(settings.user_bloom_capacity, settings.user_bloom_error_rate,
+                           settings.user_negative_cache_ttl, settings.user_bloom_rebuild_interval)
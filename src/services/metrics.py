@@ -0,0 +1,34 @@
+from bisect import bisect_left
+
+
+class Histogram:
+    """
+    Cumulative histogram of durations in seconds, in the Prometheus bucket layout.
+    """
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+
+    def snapshot(self) -> dict:
+        """
+        The snapshot function returns the histogram as a dict.
+
+        :param self: Represent the instance of the class
+        :return: A dict with count, sum, max and the cumulative counts keyed by bucket upper bound
+        """
+        histogram, total = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            histogram["+Inf" if bound == float("inf") else str(bound)] = total
+        return {"count": self.count, "sum": self.sum, "max": self.max, "histogram": histogram}
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable
+
+from fastapi import HTTPException, status
+
+from src.services.metrics import Histogram
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+def create_crypt_context(schemes: list[str], bcrypt_rounds: int, argon2_time_cost: int, argon2_memory_cost: int,
+                         argon2_parallelism: int) -> "CryptContext":
+    """
+    The create_crypt_context function builds the passlib context for password hashes.
+        New hashes use the first scheme; hashes made with any other listed scheme, or with
+        lower costs, still verify but are reported as needing an update.
+
+    :param schemes: list[str]: Enabled schemes, preferred first, e.g. ["argon2", "bcrypt"]
+    :param bcrypt_rounds: int: bcrypt cost (log2 of the number of rounds)
+    :param argon2_time_cost: int: argon2id number of iterations
+    :param argon2_memory_cost: int: argon2id memory in KiB
+    :param argon2_parallelism: int: argon2id number of lanes
+    :return: A CryptContext
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        argon2__type="ID",
+        argon2__rounds=argon2_time_cost,
+        argon2__min_rounds=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification in a bounded thread pool, off the event loop
+    (bcrypt releases the GIL while it works). When more than queue_limit operations are
+    waiting or running, new ones are rejected right away with 503 instead of queueing up.
+    The context may be given as a function that builds it; it is then built on first use,
+    so importing the application does not load passlib and its hash backends.
+    """
+
+    def __init__(self, context: "CryptContext | Callable[[], CryptContext]", workers: int, queue_limit: int):
+        self.context_factory = context if callable(context) else None
+        self._context = None if callable(context) else context
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.executor: ThreadPoolExecutor | None = None
+        self.pending = 0
+        self.rejected = 0
+        self.latency = Histogram()
+
+    @property
+    def context(self) -> "CryptContext":
+        if self._context is None:
+            self._context = self.context_factory()
+        return self._context
+
+    async def run(self, fn, *args):
+        """
+        The run function executes fn(*args) in the thread pool and waits for the result.
+
+        :param self: Represent the instance of the class
+        :param fn: The hashing function to run
+        :param args: Arguments of fn
+        :return: The result of fn
+        """
+        if self.pending >= self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Server is busy, try again later", headers={"Retry-After": "1"})
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.latency.observe(time.perf_counter() - started)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    async def hash(self, password: str) -> str:
+        return await self.run(lambda: self.context.hash(password))
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(lambda: self.context.verify(plain_password, hashed_password))
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await self.run(lambda: self.context.verify_and_update(plain_password, hashed_password))
+
+    def metrics(self) -> dict:
+        """
+        The metrics function returns the queue depth and the latency (queue wait included) of password operations.
+
+        :param self: Represent the instance of the class
+        :return: A dict with the metrics
+        """
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "rejected": self.rejected,
+            "latency_seconds": self.latency.snapshot(),
+        }
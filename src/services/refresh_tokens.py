@@ -0,0 +1,123 @@
+import logging
+
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+
+from src.services.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS: family hash, user's family set. ARGV: presented jti, new jti, family, ttl.
+# 1 = rotated, 0 = unknown or revoked family, -1 = an old token was reused and the family is now revoked
+ROTATE = """
+local current = redis.call('HGET', KEYS[1], 'jti')
+if not current then
+    return 0
+end
+if current ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    redis.call('SREM', KEYS[2], ARGV[3])
+    return -1
+end
+redis.call('HSET', KEYS[1], 'jti', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+
+class RefreshTokenStore:
+    """
+    Refresh token sessions in Redis, one token family per login (device). A family remembers the
+    jti of its latest refresh token; refreshing swaps it atomically for a new one. Presenting an
+    older token of the family means it was stolen or replayed, so the whole family is revoked.
+    Families expire ttl seconds after their last refresh. Redis errors are reported as 503.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.rotate_script = None
+        self.reused = 0
+
+    @staticmethod
+    def family_key(family: str) -> str:
+        return f"refresh:v1:family:{family}"
+
+    @staticmethod
+    def user_key(email: str) -> str:
+        return f"refresh:v1:user:{email}"
+
+    @staticmethod
+    def unavailable(e: RedisError) -> HTTPException:
+        logger.error("refresh token store failed: %r", e)
+        return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                             detail="Sessions are unavailable, try again later", headers={"Retry-After": "1"})
+
+    async def create(self, email: str, family: str, jti: str):
+        """
+        The create function starts a new token family for the user.
+
+        :param self: Represent the instance of the class
+        :param email: str: The user the family belongs to
+        :param family: str: Id of the new family
+        :param jti: str: Id of its first refresh token
+        :return: None
+        """
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.hset(self.family_key(family), mapping={"jti": jti, "sub": email})
+                pipe.expire(self.family_key(family), self.ttl)
+                pipe.sadd(self.user_key(email), family)
+                pipe.expire(self.user_key(email), self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            raise self.unavailable(e)
+
+    async def rotate(self, email: str, family: str, jti: str, new_jti: str) -> bool:
+        """
+        The rotate function replaces the current refresh token of a family, if jti is the current one.
+
+        :param self: Represent the instance of the class
+        :param email: str: The user the family belongs to
+        :param family: str: Id of the family
+        :param jti: str: Id of the presented refresh token
+        :param new_jti: str: Id of the refresh token that replaces it
+        :return: True if the token was rotated, False if it was unknown, revoked or reused
+        """
+        redis = get_redis()
+        if self.rotate_script is None:
+            self.rotate_script = redis.register_script(ROTATE)
+        try:
+            result = await self.rotate_script(keys=[self.family_key(family), self.user_key(email)],
+                                              args=[jti, new_jti, family, self.ttl], client=redis)
+        except RedisError as e:
+            raise self.unavailable(e)
+        if result == -1:
+            self.reused += 1
+            logger.warning("refresh token reuse for %s, family %s revoked", email, family)
+        return result == 1
+
+    async def revoke(self, email: str, family: str):
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.delete(self.family_key(family))
+                pipe.srem(self.user_key(email), family)
+                await pipe.execute()
+        except RedisError as e:
+            raise self.unavailable(e)
+
+    async def revoke_user(self, email: str) -> int:
+        """
+        The revoke_user function signs the user out of every device.
+
+        :param self: Represent the instance of the class
+        :param email: str: The user
+        :return: The number of revoked families
+        """
+        try:
+            redis = get_redis()
+            families = await redis.smembers(self.user_key(email))
+            await redis.delete(self.user_key(email), *(self.family_key(family.decode()) for family in families))
+        except RedisError as e:
+            raise self.unavailable(e)
+        return len(families)
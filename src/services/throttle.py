@@ -0,0 +1,120 @@
+import logging
+import math
+import time
+import uuid
+
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.services.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class LoginThrottle:
+    """
+    Sliding-window limits on failed logins, kept in Redis sorted sets so all workers share them.
+    Failures are counted per client IP and per account over the last `window` seconds. An IP over
+    its limit is rejected until old failures leave the window; an account over its limit is locked
+    for an exponentially growing back-off. The check is one Redis round trip and runs before any
+    database or password work. If Redis fails the throttle lets requests through.
+    """
+
+    def __init__(self, window: float, ip_max_failures: int, account_max_failures: int, backoff_base: float,
+                 backoff_max: float):
+        self.window = window
+        self.ip_max_failures = ip_max_failures
+        self.account_max_failures = account_max_failures
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.counters = {"checked": 0, "rejected_ip": 0, "rejected_account": 0, "failures": 0, "lockouts": 0}
+
+    @staticmethod
+    def ip_key(ip: str) -> str:
+        return f"login:v1:ip:{ip}"
+
+    @staticmethod
+    def account_key(email: str) -> str:
+        return f"login:v1:account:{email.lower()}"
+
+    @staticmethod
+    def lock_key(email: str) -> str:
+        return f"login:v1:lock:{email.lower()}"
+
+    @staticmethod
+    def too_many(retry_after: float) -> HTTPException:
+        return HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many failed login attempts",
+                             headers={"Retry-After": str(max(math.ceil(retry_after), 1))})
+
+    async def check(self, email: str, ip: str):
+        """
+        The check function rejects a login attempt with 429 when the client IP has too many recent
+        failures or the account is in back-off.
+
+        :param self: Represent the instance of the class
+        :param email: str: The account being logged into
+        :param ip: str: The client IP address
+        :return: None
+        """
+        self.counters["checked"] += 1
+        now = time.time()
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.zremrangebyscore(self.ip_key(ip), 0, now - self.window)
+                pipe.zcard(self.ip_key(ip))
+                pipe.zrange(self.ip_key(ip), 0, 0, withscores=True)
+                pipe.pttl(self.lock_key(email))
+                _, ip_failures, oldest, lock_ttl = await pipe.execute()
+        except RedisError as e:
+            logger.warning("login throttle check failed: %r", e)
+            return
+        if ip_failures >= self.ip_max_failures:
+            self.counters["rejected_ip"] += 1
+            raise self.too_many(oldest[0][1] + self.window - now if oldest else self.window)
+        if lock_ttl > 0:
+            self.counters["rejected_account"] += 1
+            raise self.too_many(lock_ttl / 1000)
+
+    async def failure(self, email: str, ip: str):
+        """
+        The failure function records a failed login and locks the account once it has
+        account_max_failures failures in the window.
+
+        :param self: Represent the instance of the class
+        :param email: str: The account being logged into
+        :param ip: str: The client IP address
+        :return: None
+        """
+        self.counters["failures"] += 1
+        now = time.time()
+        member = f"{now}:{uuid.uuid4().hex[:8]}"
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for key in (self.ip_key(ip), self.account_key(email)):
+                    pipe.zadd(key, {member: now})
+                    pipe.zremrangebyscore(key, 0, now - self.window)
+                    pipe.expire(key, math.ceil(self.window))
+                pipe.zcard(self.account_key(email))
+                account_failures = (await pipe.execute())[-1]
+            excess = account_failures - self.account_max_failures
+            if excess >= 0:
+                self.counters["lockouts"] += 1
+                backoff = min(self.backoff_base * 2 ** excess, self.backoff_max)
+                await get_redis().set(self.lock_key(email), 1, px=math.ceil(backoff * 1000))
+        except RedisError as e:
+            logger.warning("login throttle update failed: %r", e)
+
+    async def success(self, email: str):
+        try:
+            await get_redis().delete(self.account_key(email), self.lock_key(email))
+        except RedisError as e:
+            logger.warning("login throttle reset failed: %r", e)
+
+    def metrics(self) -> dict:
+        return dict(self.counters)
+
+
+login_throttle = LoginThrottle(settings.login_window, settings.login_ip_max_failures,
+                               settings.login_account_max_failures, settings.login_backoff_base,
+                               settings.login_backoff_max)
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI
+
+from src.database.db import database
+from src.services.auth import auth_service
+from src.services.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+WARMUP_EMAIL = "warmup@localhost"
+WARMUP_PATHS = ["/", "/.well-known/jwks.json", "/contacts/", "/users/me/"]
+
+
+async def warmup(app: FastAPI, db_connections: int, redis_connections: int):
+    """
+    The warmup function prepares a worker before it reports ready: it opens database and Redis
+    connections, builds the OpenAPI schema and the password hashing context (which the import of the
+    application leaves for first use) and sends one request to each of the hot routes through
+    the application itself, with a token of a user that does not exist. Failures are logged and do
+    not stop the start-up.
+
+    :param app: FastAPI: The application
+    :param db_connections: int: Connections to open per database engine
+    :param redis_connections: int: Connections to open to Redis
+    :return: None
+    """
+    started = time.perf_counter()
+    steps = [
+        ("database", database.warmup(db_connections)),
+        ("redis", asyncio.gather(*(get_redis().ping() for _ in range(redis_connections)))),
+        ("openapi", asyncio.to_thread(app.openapi)),
+        ("passwords", asyncio.to_thread(lambda: auth_service.hasher.context)),
+        ("routes", warmup_routes(app)),
+    ]
+    for name, step in steps:
+        try:
+            await step
+        except Exception:
+            logger.exception("warmup step %s failed", name)
+    logger.info("warmup finished in %.3fs", time.perf_counter() - started)
+
+
+async def warmup_routes(app: FastAPI):
+    import httpx
+
+    token = await auth_service.create_access_token({"sub": WARMUP_EMAIL, "uid": 0, "confirmed": True})
+    transport = httpx.ASGITransport(app=app, client=("warmup", 0))
+    async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as client:
+        for path in WARMUP_PATHS:
+            await client.get(path, headers={"Authorization": f"Bearer {token}"})
@@ -1,11 +1,15 @@
 import pytest
+from fakeredis import aioredis
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from main import app
 from src.database.models import Base
-from src.database.db import get_db
+from src.database.db import database, get_db, get_read_db
+from src.services.cache import redis_pool
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -15,6 +19,10 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
+# TestClient runs every request in its own event loop, so async connections must not be pooled
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
 
 @pytest.fixture(scope="module", autouse=True)
 def session():
@@ -34,15 +42,18 @@ def session():
 def client(session):
     # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    redis_pool.client = aioredis.FakeRedis()
+    database.engine = async_engine
 
-    yield TestClient(app)
+    # The context manager runs the lifespan and keeps one event loop for the whole module
+    with TestClient(app) as client:
+        yield client
 
 
 @pytest.fixture(scope="module")
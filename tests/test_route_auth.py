@@ -66,4 +66,62 @@ def test_login_wrong_email(client, user):
     )
     assert response.status_code == 401, response.text
     data = response.json()
-    assert data["detail"] == "Invalid email"
\ No newline at end of file
+    assert data["detail"] == "Invalid email"
+
+def test_server_timing_header(client, user):
+    response = client.post(
+        "auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    assert response.status_code == 200, response.text
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+
+def test_current_user_is_cached(client, user):
+    response = client.post(
+        "auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    token = response.json()["access_token"]
+    for _ in range(2):
+        response = client.get("users/me/", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200, response.text
+        assert response.json()["email"] == user.get('email')
+
+
+def test_jwks(client):
+    response = client.get(".well-known/jwks.json")
+    assert response.status_code == 200, response.text
+    assert response.json() == {"keys": []}
+    assert response.headers["Cache-Control"].startswith("public, max-age=")
+
+
+def test_refresh_token_rotation(client, user):
+    response = client.post(
+        "auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    first = response.json()["refresh_token"]
+    response = client.get("auth/refresh_token", headers={"Authorization": f"Bearer {first}"})
+    assert response.status_code == 200, response.text
+    second = response.json()["refresh_token"]
+
+    response = client.get("auth/refresh_token", headers={"Authorization": f"Bearer {first}"})
+    assert response.status_code == 401, response.text
+    assert response.json()["detail"] == "Invalid refresh token"
+    response = client.get("auth/refresh_token", headers={"Authorization": f"Bearer {second}"})
+    assert response.status_code == 401, response.text
+
+
+def test_logout_all(client, user):
+    tokens = [client.post("auth/login", data={"username": user.get('email'), "password": user.get('password')}).json()
+              for _ in range(2)]
+    response = client.post("auth/logout", headers={"Authorization": f"Bearer {tokens[0]['refresh_token']}"})
+    assert response.status_code == 204, response.text
+    response = client.get("auth/refresh_token", headers={"Authorization": f"Bearer {tokens[0]['refresh_token']}"})
+    assert response.status_code == 401, response.text
+
+    response = client.post("auth/logout_all", headers={"Authorization": f"Bearer {tokens[1]['access_token']}"})
+    assert response.status_code == 204, response.text
+    response = client.get("auth/refresh_token", headers={"Authorization": f"Bearer {tokens[1]['refresh_token']}"})
+    assert response.status_code == 401, response.text
@@ -0,0 +1,24 @@
+from unittest.mock import MagicMock
+
+from src.database.models import User
+
+
+def test_create_contacts_reports_invalid_items(client, session, user, monkeypatch):
+    monkeypatch.setattr("src.routes.auth.send_email", MagicMock())
+    client.post("auth/signup", json=user)
+    current_user: User = session.query(User).filter(User.email == user.get('email')).first()
+    current_user.confirmed = True
+    session.commit()
+    token = client.post("auth/login", data={"username": user.get('email'), "password": user.get('password')}).json()
+    contacts = [{"name": f"Wade{i}", "surname": "Wilson", "email": f"wade{i}@example.com", "phonenumber": "+380501234567",
+                 "birthday": "1990-02-01", "description": "merc"} for i in range(25)]
+    response = client.post(
+        "contacts/bulk",
+        json=contacts[:3] + ["not a contact", None] + contacts[3:],
+        headers={"Authorization": f"Bearer {token['access_token']}"},
+    )
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert len(data["created"]) == 25
+    assert [error["index"] for error in data["errors"]] == [3, 4]
+    assert data["errors"][0]["errors"][0]["type"] == "model_type"
@@ -0,0 +1,37 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from src.routes.internal import internal_only
+
+
+def test_pool_stats_rejects_public_clients(client):
+    response = client.get("internal/pool")
+    assert response.status_code == 403, response.text
+
+
+def test_cache_stats_rejects_public_clients(client):
+    response = client.get("internal/cache")
+    assert response.status_code == 403, response.text
+
+
+def test_login_stats_rejects_public_clients(client):
+    response = client.get("internal/login")
+    assert response.status_code == 403, response.text
+
+
+def test_internal_token_grants_access(client, monkeypatch):
+    monkeypatch.setattr("src.routes.internal.settings.internal_token", "s3cret")
+    response = client.get("internal/login", headers={"X-Internal-Token": "s3cret"})
+    assert response.status_code == 200, response.text
+    response = client.get("internal/login", headers={"X-Internal-Token": "wrong"})
+    assert response.status_code == 403, response.text
+
+
+def test_allowed_networks_grant_access(monkeypatch):
+    monkeypatch.setattr("src.routes.internal.settings.internal_allowed_networks", ["10.0.0.0/8"])
+    asyncio.run(internal_only(MagicMock(client=MagicMock(host="10.1.2.3"), headers={})))
+    with pytest.raises(HTTPException):
+        asyncio.run(internal_only(MagicMock(client=MagicMock(host="192.168.1.2"), headers={})))
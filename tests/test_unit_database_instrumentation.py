@@ -0,0 +1,43 @@
+import unittest
+
+from sqlalchemy import create_engine, text
+
+from src.database.instrumentation import QueryStats, query_stats
+
+
+class TestQueryStats(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        self.stats = QueryStats()
+        self.token = query_stats.set(self.stats)
+
+    def tearDown(self):
+        query_stats.reset(self.token)
+        self.engine.dispose()
+
+    def test_counts_statements(self):
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        self.assertEqual(self.stats.statements, 2)
+        self.assertGreater(self.stats.duration, 0)
+        self.assertIn('desc="2 statements"', self.stats.server_timing())
+
+    def test_repeated_statements(self):
+        with self.engine.connect() as conn:
+            for i in range(3):
+                conn.execute(text("SELECT :id"), {"id": i})
+            conn.execute(text("SELECT 2"))
+        self.assertEqual(self.stats.repeated(3), [("SELECT ?", 3)])
+        self.assertEqual(self.stats.repeated(4), [])
+
+    def test_not_collected_outside_request(self):
+        query_stats.set(None)
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        self.assertEqual(self.stats.statements, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.pool import InstrumentedQueuePool, PoolStats, pool_status
+
+
+class TestPoolStats(unittest.TestCase):
+
+    def test_histogram_is_cumulative(self):
+        stats = PoolStats()
+        stats.observe_wait(0.0005)
+        stats.observe_wait(0.003)
+        stats.observe_wait(20)
+        histogram = stats.wait.snapshot()["histogram"]
+        self.assertEqual(histogram["0.001"], 1)
+        self.assertEqual(histogram["0.005"], 2)
+        self.assertEqual(histogram["10.0"], 2)
+        self.assertEqual(histogram["+Inf"], 3)
+        self.assertEqual(stats.checkouts, 3)
+        self.assertEqual(stats.wait.max, 20)
+
+
+class TestInstrumentedQueuePool(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://", poolclass=InstrumentedQueuePool,
+                                          pool_size=2, max_overflow=1)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_pool_status(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            status = pool_status(self.engine.pool)
+            self.assertEqual(status["checked_out"], 1)
+        status = pool_status(self.engine.pool)
+        self.assertEqual(status["size"], 2)
+        self.assertEqual(status["max_overflow"], 1)
+        self.assertEqual(status["checked_out"], 0)
+        self.assertEqual(status["checkouts"], 1)
+        self.assertEqual(status["wait_seconds"]["histogram"]["+Inf"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
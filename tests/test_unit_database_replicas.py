@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fakeredis import aioredis
+from jose import jwt
+from redis.exceptions import ConnectionError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.replicas import ReplicaSet, RecentWriters
+
+
+class TestReplicaSet(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.first, self.second = MagicMock(), MagicMock()
+        self.replicas = ReplicaSet([self.first, self.second], retry_interval=30)
+
+    async def test_round_robin(self):
+        picked = [await self.replicas.pick() for _ in range(4)]
+        self.assertEqual(picked, [self.first, self.second, self.first, self.second])
+
+    async def test_skips_replica_marked_down(self):
+        self.replicas.mark_down(self.first)
+        self.assertFalse(self.replicas.is_healthy(self.first))
+        self.assertEqual([await self.replicas.pick() for _ in range(3)], [self.second] * 3)
+
+    async def test_all_down_falls_back_to_primary(self):
+        self.replicas.mark_down(self.first)
+        self.replicas.mark_down(self.second)
+        self.assertIsNone(await self.replicas.pick())
+
+    async def test_no_replicas(self):
+        self.assertIsNone(await ReplicaSet([], retry_interval=30).pick())
+
+    async def test_replica_returns_after_successful_probe(self):
+        engine = create_async_engine("sqlite+aiosqlite://")
+        replicas = ReplicaSet([engine], retry_interval=0)
+        replicas.mark_down(engine)
+        self.assertEqual(await replicas.pick(), engine)
+        self.assertTrue(replicas.is_healthy(engine))
+        await engine.dispose()
+
+    async def test_replica_stays_down_when_probe_fails(self):
+        self.first.connect.side_effect = OSError("connection refused")
+        replicas = ReplicaSet([self.first], retry_interval=0)
+        replicas.mark_down(self.first)
+        self.assertIsNone(await replicas.pick())
+        self.assertFalse(replicas.is_healthy(self.first))
+
+    async def test_replica_is_not_used_before_retry_interval(self):
+        self.replicas.probe = AsyncMock(return_value=True)
+        self.replicas.mark_down(self.first)
+        await self.replicas.pick()
+        self.replicas.probe.assert_not_called()
+
+
+class TestRecentWriters(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = aioredis.FakeRedis()
+        self.writers = RecentWriters(window=5)
+        self.patcher = patch("src.database.replicas.get_redis", return_value=self.redis)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    @staticmethod
+    def bearer(**claims) -> str:
+        return "Bearer " + jwt.encode(claims, "secret", algorithm="HS256")
+
+    async def test_read_your_writes(self):
+        key = RecentWriters.key(self.bearer(sub="deadpool@example.com"))
+        self.assertFalse(await self.writers.wrote_recently(key))
+        await self.writers.mark(key)
+        self.assertTrue(await self.writers.wrote_recently(key))
+        self.assertAlmostEqual(await self.redis.pttl(key), 5000, delta=100)
+        self.assertFalse(await self.writers.wrote_recently(RecentWriters.key(self.bearer(sub="other@example.com"))))
+
+    async def test_refreshed_token_keeps_the_marker(self):
+        await self.writers.mark(RecentWriters.key(self.bearer(sub="deadpool@example.com", jti="first")))
+        refreshed = RecentWriters.key(self.bearer(sub="deadpool@example.com", jti="second"))
+        self.assertTrue(await self.writers.wrote_recently(refreshed))
+
+    async def test_anonymous_clients_are_not_tracked(self):
+        for authorization in [None, "Bearer", "Basic dXNlcjpwYXNz", "Bearer not-a-jwt", self.bearer(scope="x")]:
+            with self.subTest(authorization=authorization):
+                self.assertIsNone(RecentWriters.key(authorization))
+        await self.writers.mark(None)
+        self.assertFalse(await self.writers.wrote_recently(None))
+        self.assertEqual(await self.redis.dbsize(), 0)
+
+    async def test_redis_error_reads_from_primary(self):
+        key = RecentWriters.key(self.bearer(sub="deadpool@example.com"))
+        with patch.object(self.redis, "exists", AsyncMock(side_effect=ConnectionError)), \
+                patch.object(self.redis, "set", AsyncMock(side_effect=ConnectionError)):
+            await self.writers.mark(key)
+            self.assertTrue(await self.writers.wrote_recently(key))
+
+
+if __name__ == '__main__':
+    unittest.main()
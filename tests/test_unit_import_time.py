@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+# Seconds importing main may take; slow CI machines can raise it with IMPORT_TIME_BUDGET
+IMPORT_TIME_BUDGET = float(os.environ.get("IMPORT_TIME_BUDGET", 2.5))
+# Integrations loaded on first use, not when a worker starts
+LAZY_MODULES = ["cloudinary", "fastapi_mail", "libgravatar", "passlib", "httpx"]
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    The import_times function imports a module in a fresh interpreter with -X importtime.
+
+    :param module: str: The module to import
+    :return: The cumulative import time in microseconds of every module that was imported
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            env=os.environ, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import_times("main")  # the first run may also write the bytecode caches
+        cls.times = import_times("main")
+
+    def test_main_within_budget(self):
+        self.assertLess(self.times["main"] / 1e6, IMPORT_TIME_BUDGET)
+
+    def test_integrations_are_not_imported(self):
+        for module in LAZY_MODULES:
+            with self.subTest(module=module):
+                self.assertNotIn(module, self.times)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,39 +1,62 @@
 import unittest
+from datetime import date
 from unittest.mock import MagicMock
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import Contact, User
-from src.schemas.contact import ContactModel, ContactUpdateSchema
+from src.schemas.contact import ContactModel, ContactUpdateSchema, ContactPatchSchema
 from src.repository.contacts import (
     get_contacts_by_params,
     get_contact,
     create_contact,
+    create_contacts,
     remove_contact,
     update_contact,
+    patch_contact,
+    birthday_ranges,
+    get_upcoming_birthdays,
 )
 
 
 class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
+        self.session.scalars.return_value = self.result
         self.user = User(id=1)
 
     async def test_get_contacts_by_params(self):
         contacts = [Contact(), Contact(), Contact(), Contact(), Contact()]
-        self.session.query().filter().offset().limit().all.return_value = contacts
+        self.result.scalars().all.return_value = contacts
         result = await get_contacts_by_params(name='testname', surname='testsurname', email='test@test.com', skip=0, limit=10, user=self.user, db=self.session)
         self.assertEqual(result, contacts)
 
+    async def test_get_contacts_after_cursor(self):
+        contacts = [Contact(), Contact()]
+        self.result.scalars().all.return_value = contacts
+        result = await get_contacts_by_params(name=None, surname=None, email=None, skip=0, limit=10, user=self.user, db=self.session,
+                                              sort="surname", after=("Shevchenko", 7))
+        self.assertEqual(result, contacts)
+        stmt = str(self.session.execute.call_args.args[0])
+        self.assertIn("ORDER BY contacts.surname, contacts.id", stmt)
+        self.assertNotIn("OFFSET", stmt)
+
+    async def test_get_contacts_does_not_join_users(self):
+        self.result.scalars().all.return_value = []
+        await get_contacts_by_params(name=None, surname=None, email=None, skip=0, limit=10, user=self.user, db=self.session)
+        self.assertNotIn("users", str(self.session.execute.call_args.args[0]))
+
     async def test_get_contact(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalar_one_or_none.return_value = contact
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_get_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalar_one_or_none.return_value = None
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
@@ -47,42 +70,121 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.birthday, body.birthday)
         self.assertTrue(hasattr(result, "id"))
 
+    async def test_create_contacts(self):
+        bodies = [ContactModel(name="test", surname="test", email="test@test.com", phonenumber="+380441234567", birthday="2024-05-14"),
+                  ContactModel(name="test2", surname="test2", email="test2@test.com", phonenumber="+380441234568", birthday="2024-12-31")]
+        contacts = [Contact(), Contact()]
+        self.result.all.return_value = contacts
+        result = await create_contacts(bodies=bodies, user=self.user, db=self.session)
+        self.assertEqual(result, contacts)
+        rows = self.session.scalars.call_args.args[1]
+        self.assertEqual([row["birthday_md"] for row in rows], [514, 1231])
+        self.assertEqual({row["user_id"] for row in rows}, {1})
+        self.session.commit.assert_awaited_once()
+
+    async def test_create_contacts_empty(self):
+        result = await create_contacts(bodies=[], user=self.user, db=self.session)
+        self.assertEqual(result, [])
+        self.session.scalars.assert_not_called()
+
     async def test_remove_contact_found(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.one_or_none.return_value = contact
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_remove_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.one_or_none.return_value = None
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
     async def test_update_contact_found(self):
         body = ContactUpdateSchema(name="test", surname="test", email="test@test.com", phonenumber="+380441234567", birthday="2024-05-14", description="test")
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.one_or_none.return_value = contact
         self.session.commit.return_value = None
         result = await update_contact(contact_id=1, body=body, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_update_contact_not_found(self):
         body = ContactUpdateSchema(name="test", surname="test", email="test@test.com", phonenumber="+380441234567", birthday="2024-05-14", description="test")
-        self.session.query().filter().first.return_value = None
+        self.result.one_or_none.return_value = None
         self.session.commit.return_value = None
         result = await update_contact(contact_id=1, body=body, user=self.user, db=self.session)
         self.assertIsNone(result)
 
     async def test_remove_contact_found(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.one_or_none.return_value = contact
         self.session.commit.return_value = None
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
-        self.session.delete.assert_called_once()
-        self.session.commit.assert_called_once()
+        self.assertTrue(str(self.session.scalars.call_args.args[0]).startswith("DELETE FROM contacts"))
+        self.session.commit.assert_awaited_once()
         self.assertIsInstance(result, Contact)
 
+    async def test_update_contact_single_statement(self):
+        body = ContactUpdateSchema(name="test", surname="test", email="test@test.com", phonenumber="+380441234567", birthday="2024-05-14", description="test")
+        self.result.one_or_none.return_value = Contact()
+        await update_contact(contact_id=1, body=body, user=self.user, db=self.session)
+        stmt = self.session.scalars.call_args.args[0]
+        self.assertTrue(str(stmt).startswith("UPDATE contacts SET"))
+        self.assertIn("RETURNING", str(stmt))
+        self.assertEqual(stmt.compile().params["birthday_md"], 514)
+        self.session.execute.assert_not_called()
+
+    async def test_patch_contact_writes_only_sent_fields(self):
+        contact = Contact()
+        self.result.one_or_none.return_value = contact
+        result = await patch_contact(contact_id=1, body=ContactPatchSchema(surname="new"), user=self.user, db=self.session)
+        self.assertEqual(result, contact)
+        stmt = str(self.session.scalars.call_args.args[0])
+        self.assertIn("SET surname=", stmt)
+        self.assertNotIn("name=:name", stmt)
+
+    async def test_patch_contact_empty(self):
+        contact = Contact()
+        self.result.scalar_one_or_none.return_value = contact
+        result = await patch_contact(contact_id=1, body=ContactPatchSchema(), user=self.user, db=self.session)
+        self.assertEqual(result, contact)
+        self.session.scalars.assert_not_called()
+        self.session.commit.assert_not_called()
+
+    async def test_get_upcoming_birthdays(self):
+        contacts = [Contact(), Contact()]
+        self.result.scalars().all.return_value = contacts
+        result = await get_upcoming_birthdays(days=7, user=self.user, db=self.session, today=date(2024, 5, 14))
+        self.assertEqual(result, contacts)
+
+    def test_create_contact_sets_birthday_md(self):
+        contact = Contact(birthday=date(1990, 12, 31))
+        self.assertEqual(contact.birthday_md, 1231)
+        contact.birthday = date(1990, 2, 1)
+        self.assertEqual(contact.birthday_md, 201)
+
+
+class TestBirthdayRanges(unittest.TestCase):
+
+    def test_within_month(self):
+        self.assertEqual(birthday_ranges(date(2024, 5, 14), 7), [(514, 521)])
+
+    def test_across_month_end(self):
+        self.assertEqual(birthday_ranges(date(2024, 5, 28), 7), [(528, 604)])
+
+    def test_across_year_end(self):
+        self.assertEqual(birthday_ranges(date(2024, 12, 29), 7), [(1229, 1231), (101, 105)])
+
+    def test_leap_day_in_non_leap_year(self):
+        self.assertEqual(birthday_ranges(date(2023, 2, 21), 7), [(221, 229)])
+        self.assertEqual(birthday_ranges(date(2023, 2, 25), 7), [(225, 304)])
+
+    def test_leap_day_in_leap_year(self):
+        self.assertEqual(birthday_ranges(date(2024, 2, 21), 7), [(221, 228)])
+        self.assertEqual(birthday_ranges(date(2024, 2, 22), 7), [(222, 229)])
+
+    def test_whole_year(self):
+        self.assertEqual(birthday_ranges(date(2024, 5, 14), 366), [(101, 1231)])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
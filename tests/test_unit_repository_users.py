@@ -0,0 +1,40 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.repository.users import get_user_by_email
+
+
+class TestGetUserByEmail(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.session = MagicMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.result.scalar_one_or_none.return_value = None
+        self.session.execute.return_value = self.result
+        self.known_emails = MagicMock(might_exist=AsyncMock(return_value=True), remember_missing=AsyncMock())
+        self.patcher = patch("src.repository.users.known_emails", self.known_emails)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    async def test_miss_on_primary_is_remembered(self):
+        self.session.info = {}
+        self.assertIsNone(await get_user_by_email("nobody@example.com", self.session))
+        self.known_emails.remember_missing.assert_awaited_once_with("nobody@example.com")
+
+    async def test_miss_on_replica_is_not_remembered(self):
+        self.session.info = {"replica": True}
+        self.assertIsNone(await get_user_by_email("nobody@example.com", self.session))
+        self.known_emails.remember_missing.assert_not_awaited()
+
+    async def test_unknown_email_skips_the_query(self):
+        self.known_emails.might_exist.return_value = False
+        self.assertIsNone(await get_user_by_email("nobody@example.com", self.session))
+        self.session.execute.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from pydantic import ValidationError
+
+from src.schemas.contact import ContactModel, ContactUpdateSchema, ContactPatchSchema
+
+
+class TestContactLimits(unittest.TestCase):
+
+    def setUp(self):
+        self.contact = {"name": "Taras", "surname": "Shevchenko", "email": "taras@example.com",
+                        "phonenumber": "+380441234567", "birthday": "1814-03-09", "description": "poet"}
+
+    def test_valid(self):
+        ContactModel.model_validate(self.contact)
+        ContactUpdateSchema.model_validate(self.contact)
+
+    def test_values_longer_than_their_columns(self):
+        too_long = {"phonenumber": "+38044123456789", "email": "t" * 90 + "@example.com", "description": "x" * 151}
+        for schema in (ContactModel, ContactUpdateSchema, ContactPatchSchema):
+            for field, value in too_long.items():
+                with self.subTest(schema=schema.__name__, field=field), self.assertRaises(ValidationError):
+                    schema.model_validate({**self.contact, field: value})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from fakeredis import aioredis
+from redis.exceptions import TimeoutError
+
+from src.database.models import User
+from src.services.cache import LocalCache, UserCache, UserSnapshot
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = aioredis.FakeRedis()
+        self.cache = UserCache(ttl=300, local_size=10, local_ttl=30)
+        self.user = UserSnapshot(id=1, email="test@example.com", username="test", avatar=None, confirmed=True)
+        self.patcher = patch("src.services.cache.get_redis", return_value=self.redis)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    async def test_set_with_ttl(self):
+        await self.cache.set(self.user)
+        self.assertEqual(await self.cache.get("test@example.com"), self.user)
+        self.assertEqual(await self.redis.ttl("user:v2:test@example.com"), 300)
+
+    async def test_miss(self):
+        self.assertIsNone(await self.cache.get("test@example.com"))
+        self.assertEqual(self.cache.metrics()["local"]["misses"], 1)
+        self.assertEqual(self.cache.metrics()["redis"]["misses"], 1)
+
+    async def test_tiers(self):
+        await self.cache.set(self.user)
+        await self.cache.get("test@example.com")
+        self.cache.local.clear()
+        await self.cache.get("test@example.com")
+        await self.cache.get("test@example.com")
+        metrics = self.cache.metrics()
+        self.assertEqual(metrics["local"], {"hits": 2, "misses": 1, "size": 1})
+        self.assertEqual(metrics["redis"], {"hits": 1, "misses": 0})
+
+    async def test_invalidate_other_workers(self):
+        other = UserCache(ttl=300, local_size=10, local_ttl=30)
+        listener = asyncio.create_task(other.listen())
+        await asyncio.sleep(0.1)
+        await self.cache.set(self.user)
+        await other.get("test@example.com")
+        self.assertEqual(len(other.local), 1)
+        await self.cache.invalidate("test@example.com")
+        for _ in range(50):
+            if not len(other.local):
+                break
+            await asyncio.sleep(0.02)
+        listener.cancel()
+        self.assertEqual(len(other.local), 0)
+        self.assertIsNone(await self.redis.get(UserCache.key("test@example.com")))
+
+    async def test_invalid_entry_is_a_miss(self):
+        await self.redis.set(UserCache.key("test@example.com"), b"\x80\x04garbage")
+        self.assertIsNone(await self.cache.get("test@example.com"))
+
+    async def test_redis_errors_are_misses(self):
+        self.redis.get = AsyncMock(side_effect=TimeoutError("Timeout reading from socket"))
+        self.redis.set = AsyncMock(side_effect=TimeoutError("Timeout reading from socket"))
+        await self.cache.set(self.user)
+        self.cache.local.clear()
+        self.assertIsNone(await self.cache.get("test@example.com"))
+
+
+class TestUserCacheLoading(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = aioredis.FakeRedis()
+        self.cache = UserCache(ttl=300, local_size=10, local_ttl=30)
+        self.user = UserSnapshot(id=1, email="test@example.com", username="test", avatar=None, confirmed=True)
+        self.loads = 0
+        self.patcher = patch("src.services.cache.get_redis", return_value=self.redis)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    async def load(self):
+        self.loads += 1
+        await asyncio.sleep(0.05)
+        return self.user
+
+    async def test_single_flight(self):
+        users = await asyncio.gather(*(self.cache.get_or_load("test@example.com", self.load) for _ in range(10)))
+        self.assertEqual(users, [self.user] * 10)
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(self.cache.metrics()["coalesced"], 9)
+        self.assertEqual(self.cache.loading, {})
+        entry = await self.cache.get_remote("test@example.com")
+        self.assertGreaterEqual(entry.delta, 0.05)
+
+    async def test_cancelled_caller_does_not_cancel_load(self):
+        first = asyncio.create_task(self.cache.get_or_load("test@example.com", self.load))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(self.cache.get_or_load("test@example.com", self.load))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, self.user)
+
+    async def test_early_refresh(self):
+        await self.cache.set(self.user, delta=1.0)
+        self.cache.local.clear()
+        self.assertEqual(await self.cache.get_or_load("test@example.com", self.load), self.user)
+        self.assertEqual(self.loads, 0)
+        self.cache.local.clear()
+        with patch("src.services.cache.time.time", return_value=time.time() + 299.5), \
+                patch("src.services.cache.random.random", return_value=0.9):
+            await self.cache.get_or_load("test@example.com", self.load)
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(self.cache.metrics()["early_refreshes"], 1)
+
+    async def test_lock_waits_for_other_worker(self):
+        other = UserCache(ttl=300, local_size=10, local_ttl=30, lock=True, lock_timeout=1)
+        self.cache.lock = True
+        users = await asyncio.gather(self.cache.get_or_load("test@example.com", self.load),
+                                     other.get_or_load("test@example.com", self.load))
+        self.assertEqual(users, [self.user, self.user])
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(self.cache.metrics()["lock_waits"] + other.metrics()["lock_waits"], 1)
+        self.assertFalse(await self.redis.exists(UserCache.key("test@example.com") + ":lock"))
+
+    async def test_expired_lock_of_another_worker_is_kept(self):
+        self.cache.lock = True
+        self.cache.lock_timeout = 0.01
+        lock_key = UserCache.key("test@example.com") + ":lock"
+
+        async def slow_load():
+            await asyncio.sleep(0.05)
+            await self.redis.set(lock_key, "other worker")
+            return self.user
+
+        await self.cache.get_or_load("test@example.com", slow_load)
+        self.assertEqual(await self.redis.get(lock_key), b"other worker")
+
+    async def test_unknown_user_is_not_cached(self):
+        async def load():
+            return None
+        self.assertIsNone(await self.cache.get_or_load("test@example.com", load))
+        self.assertIsNone(await self.redis.get(UserCache.key("test@example.com")))
+
+
+class TestLocalCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = LocalCache(maxsize=2, ttl=30)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+
+    def test_ttl(self):
+        cache = LocalCache(maxsize=2, ttl=30)
+        with patch("src.services.cache.time.monotonic", return_value=100):
+            cache.set("a", 1)
+        with patch("src.services.cache.time.monotonic", return_value=131):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
+class TestUserSnapshot(unittest.TestCase):
+
+    def test_from_user(self):
+        user = User(id=1, username="test", email="test@example.com", password="hash", avatar="url",
+                    refresh_token="token", confirmed=None)
+        snapshot = UserSnapshot.from_user(user)
+        self.assertEqual(snapshot, UserSnapshot(id=1, email="test@example.com", username="test", avatar="url",
+                                                confirmed=False))
+        self.assertNotIn(b"hash", UserCache.encoder.encode(snapshot))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from src.services.cursor import encode_cursor, decode_cursor
+
+
+class TestCursor(unittest.TestCase):
+
+    def test_round_trip(self):
+        cursor = encode_cursor("name", "Olena", 42)
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor, "name"), ("Olena", 42))
+
+    def test_other_sort_order(self):
+        cursor = encode_cursor("name", "Olena", 42)
+        with self.assertRaises(ValueError):
+            decode_cursor(cursor, "email")
+
+    def test_malformed(self):
+        for cursor in ("", "not a cursor", encode_cursor("id", None, "42")):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor, "id")
+
+    def test_key_of_wrong_type(self):
+        for sort, key in (("name", {"a": 1}), ("name", 5), ("email", None), ("id", "Olena")):
+            with self.subTest(sort=sort, key=key), self.assertRaises(ValueError):
+                decode_cursor(encode_cursor(sort, key, 1), sort)
+
+    def test_id_cursor(self):
+        self.assertEqual(decode_cursor(encode_cursor("id", None, 42), "id"), (None, 42))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import gzip
+import json
+import unittest
+from datetime import date
+
+from src.services.export import export_rows
+
+ROWS = [
+    (1, "Taras", "Shevchenko", "taras@example.com", "+380441234567", date(1814, 3, 9), None),
+    (2, "Lesya", "Ukrainka", "lesya@example.com", "+380441234568", date(1871, 2, 25), 'poet, "Forest Song"'),
+]
+
+
+async def batches():
+    yield ROWS[:1]
+    yield ROWS[1:]
+
+
+class TestExportRows(unittest.IsolatedAsyncioTestCase):
+
+    async def collect(self, fmt, compress=False):
+        return b"".join([chunk async for chunk in export_rows(batches(), fmt, compress)])
+
+    async def test_csv(self):
+        lines = (await self.collect("csv")).decode().splitlines()
+        self.assertEqual(lines[0], "id,name,surname,email,phonenumber,birthday,description")
+        self.assertEqual(lines[1], "1,Taras,Shevchenko,taras@example.com,+380441234567,1814-03-09,")
+        self.assertEqual(lines[2], '2,Lesya,Ukrainka,lesya@example.com,+380441234568,1871-02-25,"poet, ""Forest Song"""')
+
+    async def test_ndjson(self):
+        lines = (await self.collect("ndjson")).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Taras", "Lesya"])
+        self.assertEqual(json.loads(lines[0])["birthday"], "1814-03-09")
+
+    async def test_gzip(self):
+        self.assertEqual(gzip.decompress(await self.collect("ndjson", compress=True)), await self.collect("ndjson"))
+
+
+if __name__ == '__main__':
+    unittest.main()
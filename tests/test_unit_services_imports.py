@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from fakeredis import aioredis
+from sqlalchemy import select
+from sqlalchemy.exc import DataError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base, Contact, User
+from src.repository import contacts as repository_contacts
+from src.schemas.contact import ContactModel
+from src.services.imports import ImportJobs, parse_csv, parse_ndjson, parse_vcard, insert_rows, run_import, validate_rows
+
+CSV = """Name,Surname,Email,Phonenumber,Birthday,Description
+Taras,Shevchenko,taras@example.com,+380441234567,1814-03-09,
+Lesya,Ukrainka,not-an-email,+380441234568,1871-02-25,poet
+"""
+
+NDJSON = """{"name": "Taras", "surname": "Shevchenko", "email": "taras@example.com", "phonenumber": "+380441234567", "birthday": "1814-03-09"}
+
+not json
+"""
+
+VCARD = """BEGIN:VCARD
+VERSION:3.0
+N:Ukrainka;Lesya;;;
+FN:Lesya Ukrainka
+EMAIL;TYPE=work:lesya@example.com
+TEL;TYPE=cell:+380 441234568
+BDAY:18710225
+NOTE:Forest
+  Song
+END:VCARD
+"""
+
+
+def write(content: str) -> str:
+    with tempfile.NamedTemporaryFile("w", delete=False, suffix=".tmp") as file:
+        file.write(content)
+    return file.name
+
+
+class TestParsers(unittest.TestCase):
+
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def parse(self, parser, content):
+        path = write(content)
+        self.paths.append(path)
+        return list(parser(path))
+
+    def test_csv(self):
+        rows = self.parse(parse_csv, CSV)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0][1]["name"], "Taras")
+        self.assertIsNone(rows[0][1]["description"])
+        contacts, errors = validate_rows(rows)
+        self.assertEqual(len(contacts), 1)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("line 3: email"))
+
+    def test_ndjson(self):
+        rows = self.parse(parse_ndjson, NDJSON)
+        self.assertEqual([line for line, _ in rows], [1, 3])
+        contacts, errors = validate_rows(rows)
+        self.assertEqual(contacts[0][1].surname, "Shevchenko")
+        self.assertTrue(errors[0].startswith("line 3:"))
+
+    def test_vcard(self):
+        rows = self.parse(parse_vcard, VCARD)
+        self.assertEqual(rows[0][1], {"name": "Lesya", "surname": "Ukrainka", "email": "lesya@example.com",
+                                      "phonenumber": "+380441234568", "birthday": "1871-02-25",
+                                      "description": "Forest Song"})
+
+
+class TestRunImport(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        self.SessionLocal = async_sessionmaker(self.engine, expire_on_commit=False)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with self.SessionLocal() as db:
+            self.user = User(email="importer@example.com", password="secret")
+            db.add(self.user)
+            await db.commit()
+        self.jobs = ImportJobs(aioredis.FakeRedis())
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_run_import(self):
+        path = write(CSV)
+        job_id = await self.jobs.create(self.user.id, "csv")
+        with patch("src.services.imports.import_jobs", self.jobs), \
+                patch("src.services.imports.SessionLocal", self.SessionLocal):
+            await run_import(job_id, path, "csv", self.user)
+        job = await self.jobs.get(job_id)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual((job["processed"], job["imported"], job["failed"]), (2, 1, 1))
+        self.assertEqual(len(job["errors"]), 1)
+        self.assertFalse(os.path.exists(path))
+        async with self.SessionLocal() as db:
+            contacts = (await db.execute(select(Contact).filter(Contact.user_id == self.user.id))).scalars().all()
+        self.assertEqual([contact.name for contact in contacts], ["Taras"])
+
+    async def test_rows_rejected_by_the_database_do_not_stop_the_import(self):
+        async with self.SessionLocal() as db:
+            rows = [(2, ContactModel(name="Taras", surname="Shevchenko", email="taras@example.com",
+                                     phonenumber="+380441234567", birthday="1814-03-09")),
+                    (3, ContactModel(name="Lesya", surname="Ukrainka", email="lesya@example.com",
+                                     phonenumber="+380441234568", birthday="1871-02-25"))]
+            real_create = repository_contacts.create_contacts
+
+            async def create_contacts(bodies, db, user):
+                if any(body.name == "Lesya" for body in bodies):
+                    raise DataError("INSERT", {}, Exception("value too long for type character varying(13)"))
+                return await real_create(bodies, db, user)
+
+            with patch("src.services.imports.repository_contacts.create_contacts", create_contacts):
+                imported, errors = await insert_rows(rows, db, self.user)
+        self.assertEqual(imported, 1)
+        self.assertEqual(errors, ["line 3: value too long for type character varying(13)"])
+        async with self.SessionLocal() as db:
+            contacts = (await db.execute(select(Contact).filter(Contact.user_id == self.user.id))).scalars().all()
+        self.assertEqual([contact.name for contact in contacts], ["Taras"])
+
+
+if __name__ == '__main__':
+    unittest.main()
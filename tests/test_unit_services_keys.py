@@ -0,0 +1,50 @@
+import unittest
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import JWTError, jwt
+
+from src.services.keys import KeyRing
+
+
+def pem_pair(key):
+    private = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption()).decode()
+    public = key.public_key().public_bytes(serialization.Encoding.PEM,
+                                           serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    return private, public
+
+
+class TestKeyRing(unittest.TestCase):
+
+    def test_hmac(self):
+        keys = KeyRing("HS256", secret="secret")
+        self.assertEqual(keys.decode(keys.encode({"sub": "test"})), {"sub": "test"})
+        self.assertEqual(keys.jwks(), {"keys": []})
+
+    def test_rotation(self):
+        for algorithm, generate in (("RS256", lambda: rsa.generate_private_key(65537, 2048)),
+                                    ("ES256", lambda: ec.generate_private_key(ec.SECP256R1()))):
+            with self.subTest(algorithm=algorithm):
+                old, new = pem_pair(generate()), pem_pair(generate())
+                old_keys = KeyRing(algorithm, signing_key=old[0])
+                keys = KeyRing(algorithm, signing_key=new[0], verification_keys=[old[1]])
+                token = keys.encode({"sub": "test"})
+                self.assertEqual(jwt.get_unverified_header(token)["kid"], keys.signing_kid)
+                self.assertEqual(keys.decode(token), {"sub": "test"})
+                self.assertEqual(keys.decode(old_keys.encode({"sub": "old"})), {"sub": "old"})
+                with self.assertRaises(JWTError):
+                    old_keys.decode(token)
+                jwks = keys.jwks()["keys"]
+                self.assertEqual({key["kid"] for key in jwks}, {keys.signing_kid, old_keys.signing_kid})
+                self.assertTrue(all("d" not in key for key in jwks))
+
+    def test_hmac_token_is_rejected(self):
+        keys = KeyRing("RS256", signing_key=pem_pair(rsa.generate_private_key(65537, 2048))[0])
+        token = jwt.encode({"sub": "test"}, "secret", algorithm="HS256", headers={"kid": keys.signing_kid})
+        with self.assertRaises(JWTError):
+            keys.decode(token)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fakeredis import aioredis
+from redis.exceptions import ConnectionError
+
+from src.services.known_emails import KnownEmails
+
+
+async def batches(*batches):
+    for batch in batches:
+        yield batch
+
+
+class TestKnownEmails(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = aioredis.FakeRedis()
+        self.emails = KnownEmails(capacity=1000, error_rate=0.01, negative_ttl=60)
+        self.patcher = patch("src.services.known_emails.get_redis", return_value=self.redis)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_sizing(self):
+        self.assertEqual((self.emails.size, self.emails.hashes), (9586, 7))
+
+    async def test_negative_cache(self):
+        self.assertTrue(await self.emails.might_exist("nobody@example.com"))
+        await self.emails.remember_missing("nobody@example.com")
+        self.assertFalse(await self.emails.might_exist("nobody@example.com"))
+        self.assertEqual(await self.redis.ttl(self.emails.negative_key("nobody@example.com")), 60)
+        await self.emails.add("nobody@example.com")
+        self.assertTrue(await self.emails.might_exist("nobody@example.com"))
+
+    async def test_bloom_filter(self):
+        self.assertTrue(await self.emails.might_exist("nobody@example.com"))
+        self.assertTrue(await self.emails.rebuild(batches([f"user{i}@example.com" for i in range(500)],
+                                                          ["last@example.com"])))
+        self.assertFalse(await self.emails.rebuild(batches()))
+        self.assertTrue(await self.emails.might_exist("user42@example.com"))
+        self.assertTrue(await self.emails.might_exist("last@example.com"))
+        self.assertFalse(await self.emails.might_exist("nobody@example.com"))
+        await self.emails.add("nobody@example.com")
+        self.assertTrue(await self.emails.might_exist("nobody@example.com"))
+        false_positives = sum([await self.emails.might_exist(f"other{i}@example.com") for i in range(1000)])
+        self.assertLess(false_positives, 30)
+        metrics = self.emails.metrics()
+        self.assertEqual(metrics["bloom_rejects"], 1000 - false_positives + 1)
+
+    async def test_rebuild_is_exclusive(self):
+        await self.redis.set(self.emails.bloom_key + ":building", 1)
+        self.assertFalse(await self.emails.rebuild(batches(["user@example.com"])))
+        self.assertTrue(await self.emails.might_exist("nobody@example.com"))
+
+    async def test_ready_flag_expires(self):
+        emails = KnownEmails(capacity=1000, error_rate=0.01, negative_ttl=60, rebuild_interval=3600)
+        self.assertTrue(await emails.rebuild(batches(["user@example.com"])))
+        self.assertEqual(await self.redis.ttl(emails.ready_key), 3600)
+
+    async def test_failed_add_is_retried(self):
+        await self.emails.rebuild(batches(["user@example.com"]))
+        pipeline = self.redis.pipeline
+        self.redis.pipeline = MagicMock(side_effect=ConnectionError("Connection refused"))
+        await self.emails.add("new@example.com")
+        self.assertEqual(self.emails.unsynced, {"new@example.com"})
+        self.assertFalse(await self.redis.exists(self.emails.ready_key))
+        self.assertTrue(await self.emails.might_exist("new@example.com"))
+        self.redis.pipeline = pipeline
+        await self.emails.sync()
+        self.assertEqual(self.emails.unsynced, set())
+        self.assertTrue(await self.emails.rebuild(batches(["user@example.com"])))
+        self.assertTrue(await self.emails.might_exist("new@example.com"))
+
+    async def test_redis_errors_mean_maybe(self):
+        self.redis.pipeline = MagicMock(side_effect=ConnectionError("Connection refused"))
+        self.assertTrue(await self.emails.might_exist("nobody@example.com"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from src.services.passwords import PasswordHasher, create_crypt_context
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.hasher = PasswordHasher(CryptContext(schemes=["bcrypt"], bcrypt__rounds=4), workers=2, queue_limit=2)
+
+    def tearDown(self):
+        self.hasher.close()
+
+    async def test_hash_and_verify(self):
+        hashed = await self.hasher.hash("secret")
+        self.assertTrue(await self.hasher.verify("secret", hashed))
+        self.assertFalse(await self.hasher.verify("wrong", hashed))
+        metrics = self.hasher.metrics()
+        self.assertEqual(metrics["latency_seconds"]["count"], 3)
+        self.assertEqual(metrics["in_flight"], 0)
+
+    async def test_rejects_when_saturated(self):
+        release = threading.Event()
+        blocked = [asyncio.create_task(self.hasher.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with self.assertRaises(HTTPException) as e:
+            await self.hasher.hash("secret")
+        self.assertEqual(e.exception.status_code, 503)
+        self.assertEqual(self.hasher.metrics()["rejected"], 1)
+        self.assertEqual(self.hasher.metrics()["in_flight"], 2)
+        release.set()
+        await asyncio.gather(*blocked)
+        self.assertEqual(self.hasher.pending, 0)
+
+    async def test_context_factory_runs_on_first_use(self):
+        factory = MagicMock(return_value=CryptContext(schemes=["bcrypt"], bcrypt__rounds=4))
+        hasher = PasswordHasher(factory, workers=1, queue_limit=2)
+        try:
+            factory.assert_not_called()
+            hashed = await hasher.hash("secret")
+            self.assertTrue(await hasher.verify("secret", hashed))
+            factory.assert_called_once_with()
+        finally:
+            hasher.close()
+
+
+class TestCryptContext(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.old = create_crypt_context(["bcrypt"], bcrypt_rounds=4, argon2_time_cost=1, argon2_memory_cost=1024,
+                                        argon2_parallelism=1)
+        self.new = create_crypt_context(["argon2", "bcrypt"], bcrypt_rounds=5, argon2_time_cost=2,
+                                        argon2_memory_cost=2048, argon2_parallelism=1)
+        self.hasher = PasswordHasher(self.new, workers=1, queue_limit=4)
+
+    def tearDown(self):
+        self.hasher.close()
+
+    async def test_new_hashes_use_argon2id(self):
+        hashed = await self.hasher.hash("secret")
+        self.assertTrue(hashed.startswith("$argon2id$"))
+        self.assertEqual(await self.hasher.verify_and_update("secret", hashed), (True, None))
+
+    async def test_rehash_deprecated_scheme(self):
+        verified, new_hash = await self.hasher.verify_and_update("secret", self.old.hash("secret"))
+        self.assertTrue(verified)
+        self.assertTrue(new_hash.startswith("$argon2id$"))
+        self.assertTrue(self.new.verify("secret", new_hash))
+
+    async def test_rehash_lower_cost(self):
+        cheap = create_crypt_context(["argon2"], bcrypt_rounds=4, argon2_time_cost=1, argon2_memory_cost=1024,
+                                     argon2_parallelism=1)
+        verified, new_hash = await self.hasher.verify_and_update("secret", cheap.hash("secret"))
+        self.assertTrue(verified)
+        self.assertIn("m=2048,t=2", new_hash)
+
+    async def test_wrong_password_is_not_rehashed(self):
+        self.assertEqual(await self.hasher.verify_and_update("wrong", self.old.hash("secret")), (False, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from fakeredis import aioredis
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError
+
+from src.services.refresh_tokens import RefreshTokenStore
+
+
+class TestRefreshTokenStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = aioredis.FakeRedis()
+        self.store = RefreshTokenStore(ttl=60)
+        self.patcher = patch("src.services.refresh_tokens.get_redis", return_value=self.redis)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    async def test_rotate(self):
+        await self.store.create("test@example.com", "family", "first")
+        self.assertTrue(await self.store.rotate("test@example.com", "family", "first", "second"))
+        self.assertTrue(await self.store.rotate("test@example.com", "family", "second", "third"))
+        self.assertEqual(await self.redis.ttl(RefreshTokenStore.family_key("family")), 60)
+
+    async def test_reuse_revokes_family(self):
+        await self.store.create("test@example.com", "family", "first")
+        await self.store.rotate("test@example.com", "family", "first", "second")
+        self.assertFalse(await self.store.rotate("test@example.com", "family", "first", "stolen"))
+        self.assertEqual(self.store.reused, 1)
+        self.assertFalse(await self.store.rotate("test@example.com", "family", "second", "third"))
+
+    async def test_devices_are_independent(self):
+        await self.store.create("test@example.com", "phone", "a")
+        await self.store.create("test@example.com", "laptop", "b")
+        await self.store.revoke("test@example.com", "phone")
+        self.assertFalse(await self.store.rotate("test@example.com", "phone", "a", "c"))
+        self.assertTrue(await self.store.rotate("test@example.com", "laptop", "b", "d"))
+
+    async def test_revoke_user(self):
+        await self.store.create("test@example.com", "phone", "a")
+        await self.store.create("test@example.com", "laptop", "b")
+        await self.store.create("other@example.com", "tablet", "c")
+        self.assertEqual(await self.store.revoke_user("test@example.com"), 2)
+        self.assertFalse(await self.store.rotate("test@example.com", "laptop", "b", "d"))
+        self.assertTrue(await self.store.rotate("other@example.com", "tablet", "c", "e"))
+
+    async def test_redis_errors(self):
+        self.redis.smembers = AsyncMock(side_effect=ConnectionError("Connection refused"))
+        with self.assertRaises(HTTPException) as e:
+            await self.store.revoke_user("test@example.com")
+        self.assertEqual(e.exception.status_code, 503)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fakeredis import aioredis
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError
+
+from src.services.throttle import LoginThrottle
+
+
+class TestLoginThrottle(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = aioredis.FakeRedis()
+        self.throttle = LoginThrottle(window=60, ip_max_failures=5, account_max_failures=2, backoff_base=10,
+                                      backoff_max=25)
+        self.patcher = patch("src.services.throttle.get_redis", return_value=self.redis)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    async def assert_rejected(self, email, ip, counter):
+        with self.assertRaises(HTTPException) as e:
+            await self.throttle.check(email, ip)
+        self.assertEqual(e.exception.status_code, 429)
+        self.assertEqual(self.throttle.metrics()[counter], 1)
+        return int(e.exception.headers["Retry-After"])
+
+    async def test_account_backoff(self):
+        await self.throttle.failure("test@example.com", "10.0.0.1")
+        await self.throttle.check("test@example.com", "10.0.0.1")
+        await self.throttle.failure("Test@example.com", "10.0.0.2")
+        self.assertEqual(await self.assert_rejected("test@example.com", "10.0.0.3", "rejected_account"), 10)
+        await self.throttle.failure("test@example.com", "10.0.0.1")
+        self.assertAlmostEqual(await self.redis.pttl(LoginThrottle.lock_key("test@example.com")), 20000, delta=100)
+        await self.throttle.failure("test@example.com", "10.0.0.1")
+        self.assertAlmostEqual(await self.redis.pttl(LoginThrottle.lock_key("test@example.com")), 25000, delta=100)
+        await self.throttle.check("other@example.com", "10.0.0.1")
+
+    async def test_success_resets_account(self):
+        for _ in range(2):
+            await self.throttle.failure("test@example.com", "10.0.0.1")
+        await self.throttle.success("test@example.com")
+        await self.throttle.check("test@example.com", "10.0.0.1")
+
+    async def test_ip_window(self):
+        for i in range(5):
+            await self.throttle.failure(f"user{i}@example.com", "10.0.0.1")
+        retry_after = await self.assert_rejected("new@example.com", "10.0.0.1", "rejected_ip")
+        self.assertLessEqual(retry_after, 60)
+        await self.throttle.check("new@example.com", "10.0.0.2")
+        with patch("src.services.throttle.time.time", return_value=time.time() + 61):
+            await self.throttle.check("new@example.com", "10.0.0.1")
+
+    async def test_fails_open(self):
+        self.redis.pipeline = MagicMock(side_effect=ConnectionError("Connection refused"))
+        await self.throttle.check("test@example.com", "10.0.0.1")
+        await self.throttle.failure("test@example.com", "10.0.0.1")
+
+
+if __name__ == '__main__':
+    unittest.main()